@@ -19,13 +19,17 @@ Notes:
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, List, Optional
+
+
+LOG_FLUSH_EVERY = 10  # Steps between actions.jsonl flushes
 
 
 def _ensure_import_path() -> None:
@@ -64,6 +68,18 @@ def _parse_args() -> argparse.Namespace:
         default=0.0,
         help="Seconds to wait before first screenshot/action",
     )
+    p.add_argument(
+        "--max-edge",
+        type=int,
+        default=1024,
+        help="Downscale screenshots so the longest edge is at most this many pixels before the vision call",
+    )
+    p.add_argument(
+        "--image-detail",
+        choices=["low", "high"],
+        default="low",
+        help="Image detail level requested from the vision provider",
+    )
     p.add_argument(
         "--dry-run",
         action="store_true",
@@ -98,9 +114,19 @@ def _llm_from_args(provider_arg: str, model: str):
 
 
 def _write_json(path: Path, data: Any) -> None:
+    from cua_backend.utils.serialization import write_json_atomic
+
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_json_atomic(path, data)
+
+
+def _jsonl_line(step: int, screenshot: str, action_data: Dict[str, Any], result: Dict[str, Any]) -> bytes:
+    from cua_backend.utils.serialization import dumps_json
+
+    # action_data is the step's single model_dump(), shared with the history entry
+    return b'{"step":%d,"screenshot":%s,"action":%s,"result":%s}\n' % (
+        step, dumps_json(screenshot), dumps_json(action_data), dumps_json(result)
+    )
 
 
 def main() -> int:
@@ -108,20 +134,24 @@ def main() -> int:
     args = _parse_args()
 
     from cua_backend.execution.desktop_controller import DesktopController
-    from cua_backend.schemas.actions import DoneAction, FailAction
+    from cua_backend.perception.screenshot import prepare_vision_image, scale_action_to_screen
+    from cua_backend.perception.ocr import image_key
+    from cua_backend.schemas.actions import DoneAction, FailAction, WaitAction
 
     run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_dir = Path(args.runs_dir) / run_id / "vision_only"
     screenshots_dir = base_dir / "screenshots"
     screenshots_dir.mkdir(parents=True, exist_ok=True)
+    ss_path_template = os.path.join(os.fspath(screenshots_dir), "step_%03d.png")
 
     controller = DesktopController(startup_delay=args.startup_delay)
     llm = _llm_from_args(args.provider, args.model)
 
+    info = llm.info()
     meta = {
         "mode": "vision_only",
-        "provider": getattr(llm.info(), "provider", "unknown"),
-        "model": getattr(llm.info(), "model", "unknown"),
+        "provider": getattr(info, "provider", "unknown"),
+        "model": getattr(info, "model", "unknown"),
         "goal": args.goal,
         "max_steps": args.max_steps,
         "dry_run": args.dry_run,
@@ -129,96 +159,99 @@ def main() -> int:
     }
     _write_json(base_dir / "metadata.json", meta)
 
-    history: List[Dict[str, Any]] = []
+    # Only the last few steps are ever sent to the model
+    history: Deque[Dict[str, Any]] = deque(maxlen=5)
     action_log_path = base_dir / "actions.jsonl"
 
+    # Single worker keeps JSONL appends in step order while disk writes
+    # happen off the screenshot -> vision -> execute loop.
+    io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision-io")
+    # One buffered handle for the whole run; flushed every LOG_FLUSH_EVERY steps and on exit
+    log_fp = open(action_log_path, "ab", buffering=8192)
+
+    def log_action(step: int, ss_path: str, action_data: Dict[str, Any], result: Dict[str, Any], flush: bool = False) -> None:
+        io_pool.submit(log_fp.write, _jsonl_line(step, ss_path, action_data, result))
+        if flush:
+            io_pool.submit(log_fp.flush)
+
     print(f"🧪 Vision-only run: provider={meta['provider']} model={meta['model']}")
     print(f"🎯 Goal: {args.goal}")
 
-    for step in range(1, args.max_steps + 1):
-        screenshot = controller.screenshot()
-        ss_path = screenshots_dir / f"step_{step:03d}.png"
-        screenshot.save(ss_path)
-
-        try:
-            action = llm.get_next_action(
-                screenshot=screenshot,
-                goal=args.goal,
-                history=history[-5:] if history else None,
-            )
-        except Exception as e:
-            print(f"❌ Vision call failed at step {step}: {e}")
-            _write_json(base_dir / "error.json", {"step": step, "error": str(e)})
-            return 1
-
-        print(f"   🤖 Vision → {action.type}: {getattr(action, 'reason', '')}")
-
-        if isinstance(action, DoneAction):
-            print(f"✅ DONE: {action.final_answer or ''}")
-            with open(action_log_path, "a", encoding="utf-8") as f:
-                f.write(
-                    json.dumps(
-                        {
-                            "step": step,
-                            "screenshot": str(ss_path),
-                            "action": action.model_dump(),
-                            "result": {"ok": True, "note": "DONE"},
-                        },
-                        ensure_ascii=False,
+    # After a WAIT, an unchanged frame would likely get the same answer from the model:
+    # replay the WAIT once instead of paying for another vision call
+    last_action: Any = None
+    last_frame_key: Optional[bytes] = None
+
+    try:
+        for step in range(1, args.max_steps + 1):
+            ss_path = ss_path_template % step
+            screenshot = controller.screenshot(save_to=ss_path)
+
+            frame_key = image_key(screenshot) if isinstance(last_action, WaitAction) else None
+            replayed = frame_key is not None and frame_key == last_frame_key
+            if replayed:
+                print("   ⏸️ Screen unchanged after WAIT, waiting again (vision call skipped)")
+                action = last_action
+            else:
+                try:
+                    image_bytes, scale = prepare_vision_image(screenshot, max_edge=args.max_edge)
+                    action = llm.get_next_action(
+                        screenshot=image_bytes,
+                        goal=args.goal,
+                        history=list(history) if history else None,
+                        image_detail=args.image_detail,
                     )
-                    + "\n"
+                    action = scale_action_to_screen(action, scale)
+                except Exception as e:
+                    print(f"❌ Vision call failed at step {step}: {e}")
+                    _write_json(base_dir / "error.json", {"step": step, "error": str(e)})
+                    return 1
+
+            print(f"   🤖 Vision → {action.type}: {getattr(action, 'reason', '')}")
+            action_data = action.model_dump()
+
+            if isinstance(action, DoneAction):
+                print(f"✅ DONE: {action.final_answer or ''}")
+                log_action(step, ss_path, action_data, {"ok": True, "note": "DONE"}, flush=True)
+                return 0
+
+            if isinstance(action, FailAction):
+                print(f"❌ FAIL: {action.error}")
+                log_action(step, ss_path, action_data, {"ok": False, "error": action.error}, flush=True)
+                return 2
+
+            if args.dry_run:
+                result = {"ok": True, "note": "dry_run (not executed)"}
+            else:
+                exec_result = controller.execute(action)
+                result = {"ok": exec_result.ok, "error": exec_result.error}
+
+            log_action(step, ss_path, action_data, result, flush=step % LOG_FLUSH_EVERY == 0)
+            last_action = action
+            if replayed:
+                # One replay at most: a screen that stays static gets asked about again
+                last_frame_key = None
+            else:
+                last_frame_key = frame_key if frame_key is not None else (
+                    image_key(screenshot) if isinstance(action, WaitAction) else None
                 )
-            return 0
-
-        if isinstance(action, FailAction):
-            print(f"❌ FAIL: {action.error}")
-            with open(action_log_path, "a", encoding="utf-8") as f:
-                f.write(
-                    json.dumps(
-                        {
-                            "step": step,
-                            "screenshot": str(ss_path),
-                            "action": action.model_dump(),
-                            "result": {"ok": False, "error": action.error},
-                        },
-                        ensure_ascii=False,
-                    )
-                    + "\n"
-                )
-            return 2
-
-        if args.dry_run:
-            result = {"ok": True, "note": "dry_run (not executed)"}
-        else:
-            exec_result = controller.execute(action)
-            result = {"ok": exec_result.ok, "error": exec_result.error}
-
-        with open(action_log_path, "a", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "step": step,
-                        "screenshot": str(ss_path),
-                        "action": action.model_dump(),
-                        "result": result,
-                    },
-                    ensure_ascii=False,
-                )
-                + "\n"
+
+            history.append(
+                {
+                    "step": step,
+                    "action": action_data,
+                    "result_ok": bool(result.get("ok")),
+                    "screenshot_path": ss_path,
+                    "error": result.get("error"),
+                }
             )
 
-        history.append(
-            {
-                "step": step,
-                "action": action.model_dump(),
-                "result_ok": bool(result.get("ok")),
-                "screenshot_path": str(ss_path),
-                "error": result.get("error"),
-            }
-        )
-
-        if not result.get("ok"):
-            print(f"   ⚠️ Execution error: {result.get('error')}")
+            if not result.get("ok"):
+                print(f"   ⚠️ Execution error: {result.get('error')}")
+    finally:
+        # Drain queued log lines, then close (and flush) the log
+        io_pool.shutdown(wait=True)
+        log_fp.close()
 
     print("⚠️ Max steps reached (vision-only)")
     return 3
@@ -1,12 +1,14 @@
-from .core import Agent
-from .state import AgentState, AgentStatus, StepRecord
+from .core import Agent, run_batch
+from .state import AgentState, AgentStatus, StepRecord, HistoryRing
 from .planner import Planner, PlannerInput, PlannerOutput, TextState, parse_actions
 
 __all__ = [
     "Agent",
+    "run_batch",
     "AgentState",
     "AgentStatus",
     "StepRecord",
+    "HistoryRing",
     "Planner",
     "PlannerInput",
     "PlannerOutput",
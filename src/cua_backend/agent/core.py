@@ -5,23 +5,80 @@ Implements OBSERVE → DECIDE → EXECUTE → VERIFY → ESCALATE state machine.
 
 from __future__ import annotations
 
-import json
+import asyncio
+import logging
+import os
+import re
 import subprocess
-from datetime import datetime
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, List
+from typing import Deque, Iterable, Optional, List, Tuple
 
 from PIL import Image
 
 from ..execution.executor import Executor, ExecutionResult
 from ..execution.desktop_controller import DesktopController
 from ..llm.base import LLMClient
-from ..schemas.actions import Action, DoneAction, FailAction, WaitAction
+from ..perception.ocr import get_text_from_image_cached, image_key
+from ..perception.screenshot import prepare_vision_image, scale_action_to_screen
+from ..schemas.actions import Action, DoneAction, FailAction
 from ..schemas.tasks import Task, TaskResult
-from .state import AgentState, StepRecord
+from ..utils.logger import get_logger
+from ..utils.serialization import write_json_atomic
+from .state import AgentState, HistoryRing
 from .planner import Planner, PlannerInput, TextState, parse_actions
 
 
+logger = get_logger(__name__)
+
+# Titles of search-result pages (intermediate, never a completion signal)
+_SEARCH_ENGINE_RE = re.compile("google|bing|search")
+
+# Words ignored when fuzzy-matching expected vs. found window titles
+_TITLE_NOISE = frozenset({"untitled", "new", "file", "window", "a", "the", "and", "system"})
+
+# Dialog/launcher titles seen mid-transition: keep polling, neither match nor fail
+_TRANSITION_TITLES = ("save as", "open file", "confirm", "select", "upload",
+                      "create new folder", "rename")
+
+
+def _title_keywords(title: str) -> set:
+    """Significant lowercase words of a window title for the keyword-intersection check."""
+    return {w for w in title.split() if w not in _TITLE_NOISE and len(w) > 2}
+
+
+def _compile_markers(indicators: str) -> Optional[re.Pattern]:
+    """
+    Build one case-insensitive pattern matching any comma-separated success marker,
+    so each completion check is a single C-level scan of the text.
+    Returns None when there are no markers.
+    """
+    markers = [m.strip().lower() for m in (indicators or "").split(",") if m.strip()]
+    if not markers:
+        return None
+    return re.compile("|".join(re.escape(m) for m in markers))
+
+
+async def run_batch(jobs: Iterable[Tuple["Agent", Task]],
+                    max_concurrency: int = 4) -> List[TaskResult]:
+    """
+    Run several (agent, task) pairs concurrently from one event loop, at most
+    max_concurrency at a time (provider rate limits). Each agent must own its
+    executor/desktop; results come back in job order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run_one(agent: "Agent", task: Task) -> TaskResult:
+        async with semaphore:
+            return await agent.run_async(task)
+
+    return list(await asyncio.gather(*(_run_one(agent, task) for agent, task in jobs)))
+
+
 class Agent:
     """
     Accessibility-first agent with local OCR & Multi-step planning.
@@ -34,257 +91,401 @@ class Agent:
         executor: DesktopController,
         vision_llm: Optional[LLMClient] = None,
         runs_dir: str = "runs",
+        vision_max_edge: int = 1024,
+        vision_high_detail_retry: bool = True,
+        vision_timeout: float = 30.0,
     ):
         self._planner = planner
         self._executor = executor
         self._vision = vision_llm
         self._runs_dir = Path(runs_dir)
-        self._history: List[str] = [] # Track actions and outcomes 
+        self._vision_max_edge = vision_max_edge  # Longest edge sent to the vision LLM
+        self._vision_high_detail_retry = vision_high_detail_retry
+        self._history = HistoryRing()  # Bounded action/outcome history for the planner
+        # (text_state, history, future) of a next-step decision requested right after a
+        # verified step; used only if the next observation and history match exactly
+        self._speculative: Optional[Tuple[TextState, List[str], Future]] = None
+        # Overlapped decision left running when a run finished; settled by the next run()
+        self._stale_plan: Optional[Future] = None
+        # Planner sequences of this run that executed and verified (seed plan on success)
+        self._run_plans: List[str] = []
+        # hash((title, url, actions)) of the last few steps, for oscillation detection
+        self._recent_signatures: Deque[int] = deque(maxlen=8)
+        # Planner calls started early (overlapping OCR) and vision escalations (overlapping
+        # desktop re-observation) run off the main loop
+        self._plan_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+        self._llm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision")
+        # Run artifacts (metadata.json) are written here, off the caller's return path
+        self._io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-io")
+        self._vision_timeout = vision_timeout
+        # (monotonic timestamp, state) of the last desktop read - full text state or window
+        # meta, consumers only need title/app/URL; dropped after every action
+        self._cached_text_state: Optional[Tuple[float, dict]] = None
+
+    async def run_async(self, task: Task) -> TaskResult:
+        """
+        Awaitable run(): lets a caller drive many tasks from one event loop,
+        e.g. asyncio.gather(*(agent.run_async(t) for agent, t in jobs)).
+        The step loop itself is blocking (X11, scrot, CDP) and runs in a worker
+        thread. Use one Agent per concurrent task - history and caches are per instance.
+        """
+        return await asyncio.to_thread(self.run, task)
+
+    def close(self) -> None:
+        """
+        Wait for pending metadata writes so they are on disk before the process
+        exits, and drop any speculative planner/vision work still queued.
+        """
+        self._plan_pool.shutdown(wait=False, cancel_futures=True)
+        self._llm_pool.shutdown(wait=False, cancel_futures=True)
+        self._io_pool.shutdown(wait=True)
+
+    def __enter__(self) -> "Agent":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def run(self, task: Task) -> TaskResult:
         """Execute task using state machine."""
         run_dir = self._runs_dir / task.run_id
         run_dir.mkdir(parents=True, exist_ok=True)
+        ss_path_template = os.path.join(os.fspath(run_dir), "step_%03d.png")
+        if self._speculative is not None:
+            self._settle(self._speculative[2])
+            self._speculative = None
+        if self._stale_plan is not None:
+            self._settle(self._stale_plan)
+            self._stale_plan = None
+        self._run_plans = []
+        self._recent_signatures.clear()
+        # Fresh per run: step numbers restart, and another goal's steps/checklist would
+        # leak into this one's prompt (and miss every cache entry planned for it)
+        self._history = HistoryRing()
 
         state = AgentState(goal=task.goal, max_steps=task.max_steps)
         state.mark_running()
         last_expected_title = None
-        success_markers = []
+        last_expected_lower = ""
+        success_markers = ""
+        markers_re: Optional[re.Pattern] = None  # Compiled once per planner response
         verified = True # Base state for first step
         consecutive_failures = 0  # Track stuck loops
 
         try:
             for step in range(1, task.max_steps + 1):
+                # Keep the planner prompt bounded: one line per failure streak, last 5 steps verbatim
+                self._history.collapse_failures()
+                self._history.archive_older_than(5)
+
                 # === 1. OBSERVE & LOCAL VALIDATION (Save LLM call) ===
-                screenshot = self._executor.screenshot()
-                ss_path = run_dir / f"step_{step:03d}.png"
-                screenshot.save(ss_path)
+                ss_path = ss_path_template % step
+                # scrot writes the step PNG itself: one encode per frame, no re-save here
+                screenshot, current_state = self._executor.observe(save_to=ss_path)
+                self._cached_text_state = (time.monotonic(), current_state)
+                # Every OCR of this frame (pre-check, post-anchor check) shares one Tesseract pass
+                ss_key = image_key(screenshot)
+                page_text: Optional[str] = None  # Lowercased OCR of this frame, filled on first use
                 
                 # === 0. CHECK COMPLETION (Locally) ===
-                current_state = self._executor.get_text_state()
                 current_title = current_state.get("window_title", "").lower()
                 current_url = current_state.get("current_url", "")
                 is_browser = current_state.get("is_browser", False)
                 
                 # Use URL for verification if in browser (more reliable than title)
-                verification_key = current_url if is_browser else current_title
+                verification_key = current_url.lower() if is_browser else current_title
+                
+                # Reuse the state observed at the top of the step (no second AX/CDP round-trip)
+                text_state = TextState(**current_state)
+                history_prompt = self._history.render_for_prompt()
                 
                 # COMPLETION CHECK: Only mark done if we have BOTH anchor match AND success indicators
                 # This prevents premature completion on intermediate pages (like Amazon homepage before searching)
-                if last_expected_title and last_expected_title.lower() in verification_key.lower():
-                    # Parse indicators string to list
-                    markers = [m.strip() for m in success_markers.split(",")] if success_markers else []
+                # STRICT POLICY: Must have success_indicators AND find them on screen
+                plan_fut: Optional[Future] = None
+                speculative, self._speculative = self._speculative, None
+                if speculative is not None:
+                    if speculative[0] == text_state and speculative[1] == history_prompt:
+                        logger.debug("   ⚡ Using prefetched plan")
+                        plan_fut = speculative[2]
+                    else:
+                        # Never decide while a stale prefetch still runs in the Planner
+                        self._settle(speculative[2])
+                
+                if last_expected_title and markers_re and last_expected_lower in verification_key:
+                    # The planner only needs text_state: start it now so the LLM round-trip
+                    # overlaps the OCR. Discarded if the goal turns out to be reached.
+                    if plan_fut is None:
+                        plan_fut = self._plan_pool.submit(
+                            self._decide_sequence, task.goal, step, history_prompt, text_state
+                        )
+                    page_text = get_text_from_image_cached(ss_key, screenshot).lower()
                     
-                    # STRICT POLICY: Must have success_indicators AND find them on screen
-                    if markers:
-                        from ..perception.ocr import get_text_from_image
-                        page_text = get_text_from_image(screenshot).lower()
-                        
-                        if any(m.lower() in page_text for m in markers):
-                            msg = f"Goal reached (Verified: {'URL' if is_browser else 'Title'}='{last_expected_title}', Content={success_markers})"
-                            done = DoneAction(final_answer=msg, reason="Anchor + Indicator Match")
-                            self._record(state, step, done, True, ss_path)
-                            state.mark_completed(msg)
-                            return TaskResult(success=True, steps_taken=step, final_answer=msg, run_id=task.run_id)
-
-                text_state = TextState(**self._executor.get_text_state())
+                    if markers_re.search(page_text):
+                        msg = f"Goal reached (Verified: {'URL' if is_browser else 'Title'}='{last_expected_title}', Content={success_markers})"
+                        done = DoneAction(final_answer=msg, reason="Anchor + Indicator Match")
+                        self._record(state, step, done, True, ss_path)
+                        state.mark_completed(msg)
+                        # Don't wait for the LLM on the way out: the next run() settles it
+                        if not plan_fut.cancel():
+                            self._stale_plan = plan_fut
+                        self._remember_success(task)
+                        return TaskResult(success=True, steps_taken=step, final_answer=msg, run_id=task.run_id)
 
                 # === 2. DECIDE (Multi-step sequence from 1 LLM call) ===
-                actions, expected_title, indicators, sub_goals = self._decide_sequence(task.goal, step, self._history, text_state)
+                if plan_fut is not None:
+                    actions, expected_title, indicators, markers_re, sub_goals, plan = plan_fut.result()
+                else:
+                    actions, expected_title, indicators, markers_re, sub_goals, plan = self._decide_sequence(task.goal, step, history_prompt, text_state)
                 last_expected_title = expected_title
+                last_expected_lower = expected_title.lower()
                 success_markers = indicators
                 
                 # Tracking sub-goals in history for the AI
                 if sub_goals:
-                    self._history.append(f"Checklist: {sub_goals}")
-
-                # === 3. EXECUTE & VALIDATE (Retry loop) ===
-                for attempt in range(2): # Up to 2 retries locally
-                    sequence_ok = True
-                    for i, action in enumerate(actions):
-                        # Execute individual action
-                        print(f"   🎯 Executing: {action.type} - {action}")
-                        result = self._executor.execute(action)
-                        print(f"   {'✅' if result.ok else '❌'} Result: ok={result.ok}, error={result.error}")
-                        action_str = f"{action.type}({getattr(action, 'key', getattr(action, 'text', ''))})"
-                        self._record(state, step, action, result.ok, ss_path, result.error)
-                        
-                        # Immediate Success/Fail signal from AI
-                        if isinstance(action, DoneAction):
-                            state.mark_completed(action.final_answer)
-                            return TaskResult(success=True, steps_taken=step, final_answer=action.final_answer, run_id=task.run_id)
-                        if isinstance(action, FailAction):
-                            state.mark_failed(action.error)
-                            return TaskResult(success=False, steps_taken=step, error=action.error, run_id=task.run_id)
-
-                    # Post-sequence Local Validation (The Anchor) with Polling
-                    anchor_found = False
-                    print(f"⌛ Waiting for anchor: '{expected_title}'...")
-                    expected_lower = expected_title.lower()
+                    self._history.set_checklist(sub_goals)
+
+                # === 3. EXECUTE (once) & VALIDATE ===
+                # Nothing after a DONE/FAIL runs; 2+ actions go out as one batch so the
+                # executor can merge runs (TYPE+TYPE, KEY+KEY, WAIT+WAIT) into single calls
+                end = next((i + 1 for i, a in enumerate(actions) if a.type in self._TERMINAL_HANDLERS),
+                           len(actions))
+                logger.debug("   🎯 Executing: %s", [a.type for a in actions[:end]])
+                if end > 1:
+                    results = self._executor.execute_batch(actions[:end])
+                else:
+                    results = [self._executor.execute(a) for a in actions[:end]]
+                self._cached_text_state = None
+                for action, result in zip(actions, results):
+                    logger.debug("   %s Result: ok=%s, error=%s", "✅" if result.ok else "❌", result.ok, result.error)
+                    self._record(state, step, action, result.ok, ss_path, result.error)
                     
-                    for poll_attempt in range(5): # Poll for up to 5 seconds
-                        current_state = self._executor.get_text_state()
-                        current_title = current_state.get("window_title", "").lower()
-                        current_app = current_state.get("active_app", "").lower()
-                        current_url = current_state.get("current_url", "")
-                        is_browser = current_state.get("is_browser", False)
-                        
-                        # Logging
-                        log_msg = f"   Poll {poll_attempt + 1}: title='{current_title}', app='{current_app}'"
-                        if is_browser:
-                            log_msg += f", url='{current_url}'"
-                        print(log_msg)
-                        
-                        # --- ANCHOR VERIFICATION ---
-                        # Check in order of reliability:
-                        
-                        # 1. App Class Name match (MOST RELIABLE for desktop apps)
-                        #    e.g. expected='Thunar', active_app='Thunar' → match!
-                        #    This works even when the window title is 'File System' or 'docs'
-                        if expected_lower in current_app:
-                            print(f"   ✅ App class match: '{expected_title}' found in app='{current_app}'")
-                            anchor_found = True
-                            break
-                        
-                        # 2. Window Title match (case-insensitive substring)
-                        if expected_lower in current_title:
-                            anchor_found = True
-                            break
-                        
-                        # 3. Browser URL match
-                        if is_browser and current_url and expected_lower in current_url.lower():
-                            anchor_found = True
-                            break
-                        
-                        # 4. Keyword Intersection (fuzzy match for multi-word titles)
-                        noise = {"untitled", "new", "file", "window", "a", "the", "and", "system"}
-                        expected_kw = {w for w in expected_lower.split() if w not in noise and len(w) > 2}
-                        found_kw = {w for w in current_title.split() if w not in noise and len(w) > 2}
-                        if expected_kw and (expected_kw & found_kw):
-                            print(f"   ✅ Keyword match: '{expected_title}' ≈ '{current_title}'")
-                            anchor_found = True
-                            break
-                        
-                        # 5. Transition Guard (dialogs, launchers)
-                        #    If we see these, keep waiting - don't match yet, but don't fail either
-                        transition_titles = ["save as", "open file", "confirm", "select", "upload",
-                                             "create new folder", "rename"]
-                        if any(t in current_title for t in transition_titles):
-                            if poll_attempt == 0:
-                                print(f"   ℹ️ Dialog detected ('{current_title}'). Waiting for target...")
-                        
-                        import time
-                        time.sleep(1)
+                    # Immediate Success/Fail signal from AI (one dict probe per action)
+                    terminal = self._TERMINAL_HANDLERS.get(action.type)
+                    if terminal is not None:
+                        self._run_plans.append(plan)
+                        return terminal(self, action, state, step, task)
+
+                # Post-sequence Local Validation (The Anchor) with Polling
+                anchor_found = False
+                logger.info("⌛ Waiting for anchor: '%s'...", expected_title)
+                expected_lower = last_expected_lower
+                
+                expected_kw = _title_keywords(expected_lower)
+                
+                # Poll with exponential back-off (50ms -> 500ms) under a 5s deadline:
+                # fast UI transitions are caught in tens of ms, worst case is unchanged.
+                deadline = time.monotonic() + 5.0
+                delay = 0.05
+                poll_attempt = 0
+                while True:
+                    current_state = self._get_window_meta_cached(ttl=0.0)  # always fresh while polling
+                    current_title = current_state.get("window_title", "").lower()
+                    current_app = current_state.get("active_app", "").lower()
+                    current_url = current_state.get("current_url", "")
+                    current_url_lo = current_url.lower()
+                    is_browser = current_state.get("is_browser", False)
                     
-                    # If anchor still not found after polling, check if app launched but
-                    # the launcher is covering it. Try to detect app in window list.
-                    if not anchor_found:
-                        try:
-                            windows = self._executor.get_window_list()
-                            for w in windows:
-                                if expected_lower in w.title.lower() or expected_lower in (w.app_name or "").lower():
-                                    print(f"   ✅ Found '{expected_title}' in background window: '{w.title}'")
-                                    # Focus it
-                                    subprocess.run(["xdotool", "windowactivate", w.window_id],
-                                                   timeout=2, capture_output=True)
-                                    import time; time.sleep(0.5)
-                                    anchor_found = True
-                                    break
-                        except Exception:
-                            pass
-                    if anchor_found:
-                        # Step sequence worked (Anchor matched)
-                        is_search_engine = any(s in current_title for s in ["google", "bing", "search"])
-                        
-                        if not is_search_engine:
-                            # Potential Full Completion (Soft check)
-                            from ..perception.ocr import get_text_from_image
-                            page_text = get_text_from_image(screenshot).lower()
-                            markers = [m.strip() for m in success_markers.split(",")] if success_markers else []
-                            
-                            if markers and any(m.lower() in page_text for m in markers):
-                                self._history.append(f"Step {step}: {actions} -> SUCCESS (Goal Indicators found)")
-                                verified = True
-                                break 
-                        
-                        # If we get here, it's either a search engine OR anchor matched but no markers found.
-                        # Either way, the SEQUENCE worked, so we don't retry.
-                        self._history.append(f"Step {step}: {actions} -> STEP SUCCESS (Anchor matched: '{current_title}')")
-                        verified = True
-                        consecutive_failures = 0  # Reset on success
+                    # Logging (level-gated: no formatting at all unless DEBUG is on)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("   Poll %d: title='%s', app='%s'%s", poll_attempt + 1, current_title,
+                                     current_app, f", url='{current_url}'" if is_browser else "")
+                    
+                    # --- ANCHOR VERIFICATION ---
+                    # Check in order of reliability:
+                    
+                    # 1. App Class Name match (MOST RELIABLE for desktop apps)
+                    #    e.g. expected='Thunar', active_app='Thunar' → match!
+                    #    This works even when the window title is 'File System' or 'docs'
+                    if expected_lower in current_app:
+                        logger.info("   ✅ App class match: '%s' found in app='%s'", expected_title, current_app)
+                        anchor_found = True
+                        break
+                    
+                    # 2. Window Title match (case-insensitive substring)
+                    if expected_lower in current_title:
+                        anchor_found = True
+                        break
+                    
+                    # 3. Browser URL match
+                    if is_browser and current_url and expected_lower in current_url_lo:
+                        anchor_found = True
                         break
+                    
+                    # 4. Keyword Intersection (fuzzy match for multi-word titles)
+                    if expected_kw and not expected_kw.isdisjoint(_title_keywords(current_title)):
+                        logger.info("   ✅ Keyword match: '%s' ≈ '%s'", expected_title, current_title)
+                        anchor_found = True
+                        break
+                    
+                    # 5. Transition Guard (dialogs, launchers)
+                    #    If we see these, keep waiting - don't match yet, but don't fail either
+                    if any(t in current_title for t in _TRANSITION_TITLES):
+                        if poll_attempt == 0:
+                            logger.info("   ℹ️ Dialog detected ('%s'). Waiting for target...", current_title)
+                    
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(delay, remaining))
+                    delay = min(delay * 1.6, 0.5)
+                    poll_attempt += 1
+                
+                # If anchor still not found after polling, check if app launched but
+                # the launcher is covering it. Try to detect app in window list.
+                if not anchor_found:
+                    try:
+                        windows = self._executor.get_window_list()
+                        for w in windows:
+                            if expected_lower in w.title.lower() or expected_lower in (w.app_name or "").lower():
+                                logger.info("   ✅ Found '%s' in background window: '%s'", expected_title, w.title)
+                                # Focus it
+                                subprocess.run(["xdotool", "windowactivate", w.window_id],
+                                               timeout=2, capture_output=True)
+                                time.sleep(0.5)
+                                self._cached_text_state = None
+                                anchor_found = True
+                                break
+                    except Exception:
+                        pass
+                # Same screen after the same actions as a few steps ago means we're oscillating
+                # (A -> B -> A) even if every anchor matched; consecutive_failures can't see that.
+                signature = hash((current_title, current_url,
+                                  tuple(tuple(a.__dict__.values()) for a in actions)))
+                revisited = signature in self._recent_signatures
+                self._recent_signatures.append(signature)
+
+                if anchor_found:
+                    # Step sequence worked (Anchor matched)
+                    is_search_engine = _SEARCH_ENGINE_RE.search(current_title) is not None
+                    indicators_found = False
+                    
+                    # No markers -> nothing to look for; skip the OCR entirely
+                    if markers_re and not is_search_engine:
+                        # Potential Full Completion (Soft check)
+                        if page_text is None:
+                            page_text = get_text_from_image_cached(ss_key, screenshot).lower()
+                        indicators_found = markers_re.search(page_text) is not None
+                    
+                    if indicators_found:
+                        self._history.append_step(step, actions, True, "SUCCESS (Goal Indicators found)")
                     else:
-                        # Hard Mismatch (Retry sequence)
-                        print(f"⚠️ Anchor mismatch: Expected '{expected_title}', got '{current_title}'")
-                        self._history.append(f"Step {step}: {actions} -> FAIL (Anchor mismatch: expected '{expected_title}' got '{current_title}')")
-                        verified = False
-                        consecutive_failures += 1
-                        self._executor.execute(WaitAction(seconds=1.5))
-
-                # === 4. ESCALATE (CDP → Vision fallback if LOCAL retries failed) ===
+                        # Search engine OR anchor matched but no markers found - the SEQUENCE still worked
+                        self._history.append_step(step, actions, True, f"STEP SUCCESS (Anchor matched: '{current_title}')")
+                    verified = True
+                    self._run_plans.append(plan)
+                    
+                    # Prefetch: after a clean streak, assume the screen stays as just polled and
+                    # request the next decision now; it runs during the next OBSERVE. Not for
+                    # browser pages: polling reads no DOM, and their plans need the element list.
+                    if consecutive_failures == 0 and step < task.max_steps and not is_browser and not revisited:
+                        self._history.collapse_failures()
+                        self._history.archive_older_than(5)
+                        spec_state = TextState(**current_state)
+                        spec_history = self._history.render_for_prompt()
+                        self._speculative = (spec_state, spec_history, self._plan_pool.submit(
+                            self._decide_sequence, task.goal, step + 1, spec_history, spec_state
+                        ))
+                    consecutive_failures = 0  # Reset on success
+                else:
+                    # Hard Mismatch: do NOT replay the sequence (double clicks/typing);
+                    # fall through to CDP/vision escalation and re-plan next step.
+                    logger.warning("⚠️ Anchor mismatch: Expected '%s', got '%s'", expected_title, current_title)
+                    self._history.append_step(step, actions, False, f"FAIL (Anchor mismatch: expected '{expected_title}' got '{current_title}')")
+                    verified = False
+                    consecutive_failures += 1
+
+                if revisited and self._vision:
+                    # Force vision now rather than pay for more planner round-trips in the loop
+                    logger.warning("⚠️ LOOP DETECTED: same screen and actions as a recent step")
+                    verified = False
+                    consecutive_failures = max(consecutive_failures, 3)
+
+                # === 4. ESCALATE (CDP → Vision fallback if LOCAL validation failed) ===
                 if not verified:
                     # Track failures - if stuck in loop, add urgent recovery hint to history
                     if consecutive_failures >= 2:
-                        print(f"⚠️ LOOP DETECTED: {consecutive_failures} consecutive failures")
+                        logger.warning("⚠️ LOOP DETECTED: %d consecutive failures", consecutive_failures)
                         recovery_hint = f"URGENT: Stuck in loop after {consecutive_failures} failures. current_url='{current_url if is_browser else 'N/A'}'. Use BROWSER_NAVIGATE or different approach!"
-                        self._history.append(recovery_hint)
+                        self._history.append_note(step, recovery_hint)
+                    
+                    # Vision is certain when there is no URL for CDP to check or we're
+                    # stuck: start it now and re-observe the desktop while it runs.
+                    vision_fut: Optional[Future] = None
+                    # Built here: AgentState's caches are only touched from this thread
+                    llm_history = state.get_history_for_llm(max_steps=3) if self._vision else None
+                    if self._vision and (consecutive_failures >= 3 or not (is_browser and current_url)):
+                        vision_fut = self._llm_pool.submit(
+                            self._escalate, screenshot, task.goal, step,
+                            expected=expected_title, found=current_url if is_browser else current_title,
+                            recent=llm_history,
+                        )
                     
-                    current_state = self._executor.get_text_state()
+                    current_state = self._get_window_meta_cached()
                     current_title = current_state.get("window_title", "unknown")
                     current_url = current_state.get("current_url", "")
                     is_browser = current_state.get("is_browser", False)
                     
                     # Try CDP verification first if in browser
                     if is_browser and current_url:
-                        print(f"🔍 Trying CDP verification...")
+                        logger.info("🔍 Trying CDP verification...")
                         # Check if URL matches expected pattern
-                        if expected_title.lower() in current_url.lower():
-                            print(f"   ✅ CDP verified: URL contains '{expected_title}'")
+                        if last_expected_lower in current_url.lower():
+                            logger.info("   ✅ CDP verified: URL contains '%s'", expected_title)
                             verified = True
-                            self._history.append(f"Step {step}: {actions} -> OK (CDP URL match)")
+                            self._history.append_step(step, actions, True, "OK (CDP URL match)")
+                            self._run_plans.append(plan)
                         else:
                             # Try checking page content via browser state
                             browser_state = self._executor.get_browser_state()
-                            if browser_state and browser_state.visible_text:
-                                if any(marker.lower() in browser_state.visible_text.lower() 
-                                       for marker in success_markers.split(",") if marker.strip()):
-                                    print(f"   ✅ CDP verified: Content markers found")
+                            if browser_state and browser_state.visible_text and markers_re:
+                                if markers_re.search(browser_state.visible_text.lower()):
+                                    logger.info("   ✅ CDP verified: Content markers found")
                                     verified = True
-                                    self._history.append(f"Step {step}: {actions} -> OK (CDP content match)")
+                                    self._history.append_step(step, actions, True, "OK (CDP content match)")
+                                    self._run_plans.append(plan)
                     
                     # Force vision if stuck in loop (even if CDP thinks it's OK - might be popup/modal)
                     if consecutive_failures >= 3 and self._vision:
-                        print(f"🚨 STUCK IN LOOP - Forcing vision escalation...")
+                        logger.warning("🚨 STUCK IN LOOP - Forcing vision escalation...")
                         verified = False  # Override CDP verification
                     
                     # Fall back to vision if CDP didn't verify OR we're stuck
                     if not verified and self._vision:
-                        print(f"🚨 Local validation failed. Escalating to Vision...")
-                        print(f"   Context: Expected '{expected_title}', found '{current_title if not is_browser else current_url}'")
+                        logger.info("🚨 Local validation failed. Escalating to Vision...")
+                        logger.info("   Context: Expected '%s', found '%s'", expected_title, current_url if is_browser else current_title)
                         
-                        fallback_action = self._escalate(
-                            screenshot, task.goal, step, 
-                            expected=expected_title, found=current_title
-                        )
+                        if vision_fut is None:
+                            vision_fut = self._llm_pool.submit(
+                                self._escalate, screenshot, task.goal, step,
+                                expected=expected_title, found=current_title,
+                                recent=llm_history,
+                            )
+                        try:
+                            fallback_action = vision_fut.result(timeout=self._vision_timeout)
+                        except FutureTimeout:
+                            logger.warning("   ⏱️ Vision escalation timed out after %.0fs", self._vision_timeout)
+                            fallback_action = None
+                            # The HTTP call can't be interrupted: leave it on the old worker so
+                            # the next escalation gets a fresh one instead of queueing behind it
+                            self._llm_pool.shutdown(wait=False, cancel_futures=True)
+                            self._llm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision")
                         
                         if fallback_action:
-                            if isinstance(fallback_action, DoneAction):
-                                print(f"🏁 Vision determined task is DONE: {fallback_action.final_answer}")
-                                state.mark_completed(fallback_action.final_answer)
-                                return TaskResult(success=True, steps_taken=step, final_answer=fallback_action.final_answer, run_id=task.run_id)
-                            elif isinstance(fallback_action, FailAction):
-                                print(f"❌ Vision determined task FAILED: {fallback_action.error}")
-                                state.mark_failed(fallback_action.error)
-                                return TaskResult(success=False, steps_taken=step, error=fallback_action.error, run_id=task.run_id)
+                            terminal = self._TERMINAL_HANDLERS.get(fallback_action.type)
+                            if terminal is not None:
+                                logger.info("🏁 Vision determined task outcome: %s", fallback_action.type)
+                                return terminal(self, fallback_action, state, step, task)
                             else:
-                                print(f"📸 Vision suggested: {fallback_action.type}")
+                                logger.info("📸 Vision suggested: %s", fallback_action.type)
                                 self._executor.execute(fallback_action)
+                                self._cached_text_state = None
                                 # Re-verify after vision action
-                                final_state = self._executor.get_text_state()
+                                final_state = self._get_window_meta_cached()
                                 if final_state.get("is_browser"):
-                                    verified = expected_title.lower() in final_state.get("current_url", "").lower()
+                                    verified = last_expected_lower in final_state.get("current_url", "").lower()
                                 else:
-                                    verified = expected_title.lower() in final_state.get("window_title", "").lower()
+                                    verified = last_expected_lower in final_state.get("window_title", "").lower()
 
         except Exception as e:
             state.mark_failed(str(e))
@@ -296,43 +497,118 @@ class Agent:
         return TaskResult(success=False, steps_taken=task.max_steps,
                           error="Max steps reached", run_id=task.run_id)
 
+    def _get_window_meta_cached(self, ttl: float = 0.2) -> dict:
+        """
+        Window title/app/URL, reusing the last read if it is younger than `ttl` seconds.
+        A fresh read uses get_window_meta(): no DOM scan, unlike get_text_state().
+        """
+        now = time.monotonic()
+        if self._cached_text_state is not None and ttl > 0:
+            ts, cached = self._cached_text_state
+            if now - ts < ttl:
+                return cached
+        meta = self._executor.get_window_meta()
+        self._cached_text_state = (time.monotonic(), meta)
+        return meta
+
+    def _finish_done(self, action: DoneAction, state: AgentState, step: int, task: Task) -> TaskResult:
+        logger.info("🏁 DONE: %s", action.final_answer)
+        state.mark_completed(action.final_answer)
+        self._remember_success(task)
+        return TaskResult(success=True, steps_taken=step, final_answer=action.final_answer, run_id=task.run_id)
+
+    def _remember_success(self, task: Task) -> None:
+        """Let the planner keep this run's executed plans as a seed for similar goals (if it supports it)."""
+        record = getattr(self._planner, "record_success", None)
+        if record is not None:
+            record(task.goal, self._run_plans)
+
+    @staticmethod
+    def _settle(fut: Future) -> None:
+        """
+        Drop a planner future whose result is not needed: cancel it, or wait it out
+        if it is already running, so it never overlaps the next decision.
+        """
+        if not fut.cancel():
+            wait([fut])
+
+    def _finish_fail(self, action: FailAction, state: AgentState, step: int, task: Task) -> TaskResult:
+        logger.info("❌ FAIL: %s", action.error)
+        state.mark_failed(action.error)
+        return TaskResult(success=False, steps_taken=step, error=action.error, run_id=task.run_id)
+
+    # Terminal action discriminator ("DONE"/"FAIL") -> handler. Keyed by the interned
+    # `type` literal: str hashes are cached, so each probe is one dict lookup.
+    _TERMINAL_HANDLERS = {
+        sys.intern(DoneAction.model_fields["type"].default): _finish_done,
+        sys.intern(FailAction.model_fields["type"].default): _finish_fail,
+    }
+
     def _decide_sequence(self, goal: str, step: int, history: List[str],
-                        text_state: TextState) -> tuple[List[Action], str, str, str]:
-        """DECIDE phase: Get a sequence of actions, expected title, success markers, and sub_goals."""
+                        text_state: TextState) -> tuple[List[Action], str, str, Optional[re.Pattern], str, str]:
+        """
+        DECIDE phase: Get a sequence of actions, expected title, success markers
+        (raw and compiled), sub_goals and the raw sequence text. Repeated situations are served by the
+        Planner's own caches, whose keys include the history.
+        """
         inp = PlannerInput(goal=goal, step=step, history=history, text_state=text_state)
         output = self._planner.decide(inp)
-        return parse_actions(output), output.expected_window_title, output.success_indicators, output.sub_goals
+        return (parse_actions(output), output.expected_window_title,
+                output.success_indicators, _compile_markers(output.success_indicators),
+                output.sub_goals, output.action_param)
 
 
     def _escalate(self, screenshot: Image.Image, goal: str, step: int, 
-                  expected: str = None, found: str = None) -> Optional[Action]:
-        """Vision fallback with targeted context."""
+                  expected: str = None, found: str = None,
+                  recent: Optional[List[dict]] = None) -> Optional[Action]:
+        """Vision fallback with targeted context (recent: AgentState.get_history_for_llm())."""
         if not self._vision:
-            print(f"   ⚠️ Vision LLM not configured, cannot escalate")
+            logger.warning("   ⚠️ Vision LLM not configured, cannot escalate")
             return None
             
         try:
             context = f"Local verification failed. Expected window title: '{expected}', but found: '{found}'."
-            action = self._vision.get_next_action(
-                screenshot=screenshot, goal=goal,
-                history=[{"step": step, "note": context}]
-            )
-            print(f"   📸 Vision returned: {action.type if action else 'None'}")
+            history = [*(recent or ()), {"step": step, "note": context}]
+            # Downscaled low-detail JPEG keeps the vision payload (tokens, latency) small
+            image_bytes, scale = prepare_vision_image(screenshot, max_edge=self._vision_max_edge)
+            try:
+                action = self._vision.get_next_action(
+                    screenshot=image_bytes, goal=goal,
+                    history=history, image_detail="low"
+                )
+                unsure = isinstance(action, FailAction)
+            except ValueError as e:  # Unparseable/invalid answer after the client's own retries
+                if not self._vision_high_detail_retry:
+                    raise
+                action, unsure = None, True
+                logger.warning("   ⚠️ Low-detail vision answer unusable (%s)", e)
+            # Auth/quota/network errors propagate: a bigger image would not fix them.
+            # A FAIL (the clients' unparseable-response result, or a real give-up) ends
+            # the task, so it is worth confirming at full detail first.
+            if unsure and self._vision_high_detail_retry:
+                logger.warning("   ⚠️ Retrying vision at full detail")
+                image_bytes, scale = prepare_vision_image(screenshot, max_edge=max(screenshot.size))
+                action = self._vision.get_next_action(
+                    screenshot=image_bytes, goal=goal,
+                    history=history, image_detail="high"
+                )
+            action = scale_action_to_screen(action, scale)
+            logger.info("   📸 Vision returned: %s", action.type if action else None)
             return action
         except Exception as e:
-            print(f"   ❌ Vision escalation error: {e}")
+            logger.error("   ❌ Vision escalation error: %s", e)
             return None
 
     def _record(self, state: AgentState, step: int, action: Action,
-                ok: bool, ss_path: Path, error: str = None):
-        state.add_step(StepRecord(
+                ok: bool, ss_path: str, error: str = None):
+        state.add_step(
             step=step, action_type=action.type,
-            action_data=action.model_dump(), result_ok=ok,
-            screenshot_path=str(ss_path), error=error
-        ))
+            action_data=action, result_ok=ok,
+            screenshot_path=ss_path, error=error
+        )
 
     def _save_meta(self, run_dir: Path, task: Task, state: AgentState):
         meta = {"task": task.goal, "steps": state.step_count,
-                "timestamp": datetime.now().isoformat()}
-        with open(run_dir / "metadata.json", "w") as f:
-            json.dump(meta, f, indent=2)
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        # Written in the background, atomically (tmp file + rename)
+        self._io_pool.submit(write_json_atomic, run_dir / "metadata.json", meta)
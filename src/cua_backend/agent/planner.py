@@ -12,16 +12,35 @@ DSPy handles:
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional, Literal, List
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Literal, List, Tuple
 import dspy
 
+try:
+    import diskcache  # Installed with dspy
+except ImportError:
+    diskcache = None
+
+from ..schemas.actions import (
+    Action, PressKeyAction, TypeAction, WaitAction, DoneAction, FailAction, ScrollAction,
+    BrowserNavigateAction, BrowserClickAction, BrowserTypeAction,
+)
+from ..utils.serialization import dumps_json
+
 
 # ─────────────────────────────────────────────────────────────
 # DATA STRUCTURES
 # ─────────────────────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class TextState:
     """Non-visual state collected during OBSERVE phase."""
     active_app: str = ""
@@ -32,22 +51,17 @@ class TextState:
     interactive_elements: str = ""  # Indexed list of clickable elements
     
 
-@dataclass
+@dataclass(slots=True)
 class PlannerInput:
     """Everything the planner needs to decide next action."""
     goal: str
     step: int
-    history: List[str] = None # List of [Action: Result] strings
-    text_state: TextState = None
-    
-    def __post_init__(self):
-        if self.history is None:
-            self.history = []
-        if self.text_state is None:
-            self.text_state = TextState()
+    history: List[str] = field(default_factory=list) # List of [Action: Result] strings
+    text_state: TextState = field(default_factory=TextState)
+    seed_plan: str = "" # Sequences that completed a similar earlier goal (set by Planner)
 
 
-@dataclass  
+@dataclass(slots=True)
 class PlannerOutput:
     """Structured decision from the planner."""
     action_type: Literal[
@@ -128,6 +142,7 @@ class PlanNextAction(dspy.Signature):
     is_browser: bool = dspy.InputField(desc="True if currently in Chrome browser")
     focused_element: str = dspy.InputField(desc="Currently focused input element (if any)")
     interactive_elements: str = dspy.InputField(desc="Indexed list of clickable elements: [1] <A> 'Link', [2] <BUTTON> 'Submit' (browser only)")
+    seed_plan: str = dspy.InputField(desc="Action sequences that completed a similar earlier goal. Adapt them to this goal and the current state, never replay blindly ('none' if no similar goal)")
     
     # Outputs
     action_sequence: str = dspy.OutputField(desc="Semicolon-separated actions. Use BROWSER_NAVIGATE to go to websites when is_browser=True.")
@@ -142,6 +157,38 @@ class PlanNextAction(dspy.Signature):
 # DSPy MODULE (the actual planner logic)
 # ─────────────────────────────────────────────────────────────
 
+@lru_cache(maxsize=None)
+def _load_app_table() -> dict:
+    """configs/xfce_apps.yaml, read and parsed once per process ({} if unavailable)."""
+    try:
+        import yaml
+        from pathlib import Path
+        # libyaml's C loader when available (several times faster than pure Python)
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        path = Path("configs/xfce_apps.yaml")
+        if path.exists():
+            with open(path, "r") as f:
+                return yaml.load(f, Loader=loader) or {}
+        return {}
+    except:
+        return {}
+
+
+@lru_cache(maxsize=None)
+def _load_knowledge() -> str:
+    """
+    App knowledge for the prompt, shared by all planners: rendered as YAML
+    with sorted keys (stable text, unlike a dict repr) and interned.
+    """
+    table = _load_app_table()
+    if not table:
+        return "No app knowledge available."
+    import yaml
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    return sys.intern(yaml.dump(table, Dumper=dumper, sort_keys=True,
+                                default_flow_style=False, allow_unicode=True))
+
+
 class ActionPlanner(dspy.Module):
     """
     Multi-step text-only planner.
@@ -150,20 +197,7 @@ class ActionPlanner(dspy.Module):
     def __init__(self):
         super().__init__()
         self.planner = dspy.ChainOfThought(PlanNextAction)
-        self.knowledge = self._load_knowledge()
-
-    def _load_knowledge(self) -> str:
-        try:
-            import yaml
-            import os
-            from pathlib import Path
-            path = Path("configs/xfce_apps.yaml")
-            if path.exists():
-                with open(path, "r") as f:
-                    return str(yaml.safe_load(f))
-            return "No app knowledge available."
-        except:
-            return "No app knowledge available."
+        self.knowledge = _load_knowledge()
     
     def forward(self, inp: PlannerInput) -> PlannerOutput:
         """Run the planner and return a sequence-aware output."""
@@ -181,6 +215,7 @@ class ActionPlanner(dspy.Module):
             is_browser=inp.text_state.is_browser,
             focused_element=inp.text_state.focused_element or "",
             interactive_elements=inp.text_state.interactive_elements or "",
+            seed_plan=inp.seed_plan or "none",
         )
         
         return PlannerOutput(
@@ -198,6 +233,72 @@ class ActionPlanner(dspy.Module):
 # PLANNER WRAPPER (easy-to-use interface)
 # ─────────────────────────────────────────────────────────────
 
+# "Step 4: " / "Steps 2-5: " prefix of a rendered history line
+_STEP_PREFIX_RE = re.compile(r"^Steps? [\d-]+: ")
+
+# Word overlap (Jaccard) above which an earlier goal's plan seeds the planner
+_TEMPLATE_MIN_SIMILARITY = 0.6
+_TEMPLATE_LIMIT = 64
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _goal_words(goal: str) -> frozenset:
+    return frozenset(_WORD_RE.findall(goal.lower()))
+
+
+# Goals whose first move is fully determined by the STANDARD SKILLS
+_OPEN_APP_RE = re.compile(r"^\s*open\s+([\w-]+)\s*$", re.IGNORECASE)
+_GO_TO_URL_RE = re.compile(r"^\s*(?:go to|navigate to|visit)\s+(\S+\.\S+?)\s*$", re.IGNORECASE)
+
+
+def _resolve_app(name: str) -> Tuple[str, str]:
+    """(binary, expected window title) for an app name, via the app knowledge table."""
+    for key, app in _load_app_table().items():
+        if not isinstance(app, dict):
+            continue
+        bin_name = str(app.get("bin", ""))
+        title = str(app.get("title", ""))
+        if name in (key.lower(), bin_name.lower(), title.lower()) or name in bin_name.lower().split("-"):
+            return bin_name or name, title or name
+    return name, name
+
+
+def _fast_path(inp: PlannerInput) -> Optional[PlannerOutput]:
+    """
+    Deterministic first move for "open <app>" and "go to <url>" goals, so the
+    LM is not asked to reproduce a standard skill. Only used before anything
+    has been tried (empty history): retries and recovery stay with the LM.
+    """
+    if inp.history:
+        return None
+    ts = inp.text_state
+    m = _OPEN_APP_RE.match(inp.goal)
+    if m:
+        bin_name, title = _resolve_app(m.group(1).lower())
+        current = f"{ts.active_app} {ts.window_title}".lower()
+        if title.lower() in current or bin_name.lower() in current:
+            return None  # Already open: let the LM decide whether we are done
+        return PlannerOutput(
+            action_type="SEQUENCE",
+            action_param=(f"PRESS_KEY(ESCAPE); WAIT(0.5); PRESS_KEY(Alt+F2); WAIT(1.5); "
+                          f"TYPE({bin_name}); PRESS_KEY(ENTER)"),
+            expected_window_title=title,
+            sub_goals=f"{title} opened",
+            reason=f"Standard skill: open {bin_name}",
+        )
+    m = _GO_TO_URL_RE.match(inp.goal)
+    if m and ts.is_browser:
+        return PlannerOutput(
+            action_type="SEQUENCE",
+            action_param=f"BROWSER_NAVIGATE({m.group(1)})",
+            expected_window_title="Google Chrome",
+            sub_goals=f"Navigate to {m.group(1)}",
+            reason=f"Standard skill: navigate to {m.group(1)}",
+        )
+    return None
+
+
 class Planner:
     """
     High-level planner interface for the agent.
@@ -213,9 +314,25 @@ class Planner:
         ))
     """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 256):
         self._module = ActionPlanner()
         self._configured = False
+        # Two-tier decision cache (LRU each): exact input, then "same situation"
+        self._exact_cache: "OrderedDict[str, PlannerOutput]" = OrderedDict()
+        self._situation_cache: "OrderedDict[str, PlannerOutput]" = OrderedDict()
+        self._cache_size = cache_size
+        # Guards the caches, templates and stats: abatch() runs decide() on several threads
+        self._lock = threading.Lock()
+        # Completed goals -> (goal words, the sequences that completed them), LRU.
+        # A deterministic stand-in for embedding similarity: no model to load.
+        self._templates: "OrderedDict[str, Tuple[frozenset, str]]" = OrderedDict()
+        self.stats = {"fast_path": 0, "exact_hits": 0, "situation_hits": 0, "disk_hits": 0, "misses": 0}
+        # Opt-in cross-process store for exact-input decisions (DESKPILOT_PLAN_CACHE=1)
+        self._disk_cache = None
+        if os.getenv("DESKPILOT_PLAN_CACHE") == "1" and diskcache is not None:
+            self._disk_cache = diskcache.Cache(os.path.expanduser(
+                os.getenv("DESKPILOT_PLAN_CACHE_DIR", "~/.deskpilot/plan_cache")
+            ))
     
     def configure(self, model: str = "gemini/gemini-2.5-flash"):
         """Configure DSPy with the specified model."""
@@ -242,97 +359,240 @@ class Planner:
         if not self._configured:
             raise RuntimeError("Planner not configured. Call configure() first.")
         
+        return self._decide(inp)
+    
+    def record_success(self, goal: str, sequences: List[str]) -> None:
+        """
+        Keep the sequences that completed `goal` as a seed plan for similar goals.
+        The caller passes only sequences that were actually executed (and verified).
+        """
+        if not sequences:
+            return
+        plan = "\n".join(f"{i}. {seq}" for i, seq in enumerate(sequences, 1))
+        with self._lock:
+            self._templates[goal] = (_goal_words(goal), plan)
+            self._templates.move_to_end(goal)
+            if len(self._templates) > _TEMPLATE_LIMIT:
+                self._templates.popitem(last=False)
+    
+    def _seed_for(self, goal: str) -> str:
+        """Plan of the most similar completed goal, or "" if none is close enough."""
+        words = _goal_words(goal)
+        best, best_score = "", _TEMPLATE_MIN_SIMILARITY
+        for other, plan in self._templates.values():
+            score = len(words & other) / (len(words | other) or 1)
+            if score >= best_score:
+                best, best_score = plan, score
+        return best
+    
+    def _decide(self, inp: PlannerInput) -> PlannerOutput:
+        output = _fast_path(inp)
+        if output is not None:
+            with self._lock:
+                self.stats["fast_path"] += 1
+            return output
+        
+        if self._cache_size <= 0:
+            return self._call_module(inp)
+        
+        keys = self._cache_keys(inp)
+        caches = (self._exact_cache, self._situation_cache)
+        with self._lock:
+            for cache, key, stat in zip(caches, keys, ("exact_hits", "situation_hits")):
+                cached = cache.get(key)
+                if cached is not None:
+                    cache.move_to_end(key)
+                    self.stats[stat] += 1
+                    return cached
+        
+        if self._disk_cache is not None:  # diskcache is thread- and process-safe itself
+            stored = self._disk_cache.get(keys[0])
+            if stored is not None:
+                output = PlannerOutput(**stored)
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._remember(keys, output)
+                return output
+        
+        with self._lock:
+            self.stats["misses"] += 1
+        output = self._call_module(inp)  # LM round-trip outside the lock
+        if not output.needs_vision:  # Screen-dependent: never replay
+            with self._lock:
+                self._remember(keys, output)
+            if self._disk_cache is not None:
+                self._disk_cache.set(keys[0], asdict(output))
+        return output
+    
+    def _call_module(self, inp: PlannerInput) -> PlannerOutput:
+        """Run the DSPy module, seeded with the plan of a similar completed goal if any."""
+        if self._templates and not inp.seed_plan:
+            with self._lock:
+                inp.seed_plan = self._seed_for(inp.goal)
         return self._module(inp)
+    
+    def _remember(self, keys: Tuple[str, str], output: PlannerOutput) -> None:
+        """Store a decision in both in-memory LRUs (caller holds self._lock)."""
+        for cache, key in zip((self._exact_cache, self._situation_cache), keys):
+            cache[key] = output
+            if len(cache) > self._cache_size:
+                cache.popitem(last=False)
+    
+    @staticmethod
+    def _cache_keys(inp: PlannerInput) -> Tuple[str, str]:
+        """
+        Exact key: goal + full text state + full history (step number excluded).
+        Situation key: goal + app/title/URL + the latest history line with its
+        step number stripped + a hash of the browser's element list (the URL and
+        title survive a SCROLL or in-page action, the elements don't) - the same
+        screen reached the same way. (A cheap, deterministic stand-in for
+        embedding similarity: no model to load.)
+        """
+        ts = inp.text_state
+        exact = dumps_json([inp.goal, asdict(ts), inp.history])
+        last = _STEP_PREFIX_RE.sub("", inp.history[-1]) if inp.history else ""
+        elements = hashlib.blake2b((ts.interactive_elements or "").encode(), digest_size=8).hexdigest()
+        situation = dumps_json([inp.goal, ts.active_app, ts.window_title, ts.current_url, last, elements])
+        return (hashlib.blake2b(exact, digest_size=16).hexdigest(),
+                hashlib.blake2b(situation, digest_size=16).hexdigest())
+    
+    async def decide_async(self, inp: PlannerInput) -> PlannerOutput:
+        """Awaitable decide(): the LM round-trip runs in a worker thread."""
+        return await asyncio.to_thread(self.decide, inp)
+    
+    async def abatch(self, inputs: List[PlannerInput], max_concurrency: int = 8) -> List[PlannerOutput]:
+        """
+        Decide many inputs concurrently (offline evaluation, cache warm-up),
+        at most max_concurrency LM calls in flight (cache/stats updates are locked). Outputs are in input order
+        and land in the decision caches like any decide() call.
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+        
+        async def _one(inp: PlannerInput) -> PlannerOutput:
+            async with sem:
+                return await self.decide_async(inp)
+        
+        return await asyncio.gather(*(_one(inp) for inp in inputs))
 
 
 # ─────────────────────────────────────────────────────────────
 # ACTION MAPPING (convert planner output to frozen Action)
 # ─────────────────────────────────────────────────────────────
 
-import re
+# NAME(param) - tolerant of a space before '(' and of newlines inside the param
+_ACTION_RE = re.compile(r"(\w+)\s*\((.*)\)", re.DOTALL)
+
+# Terminal tokens that may also appear bare, without parentheses
+_TERMINAL = frozenset({"DONE", "FAIL"})
 
 def parse_actions(output: PlannerOutput) -> list:
     """
     Parses a sequence string like 'PRESS_KEY(Alt+F2); TYPE(firefox)'
     into a list of Action objects.
     """
-    from ..schemas.actions import (
-        PressKeyAction, TypeAction, WaitAction, DoneAction, FailAction, ScrollAction,
-        BrowserNavigateAction, BrowserClickAction, BrowserTypeAction, Action
-    )
+    return list(_parse_sequence(output.action_param, output.reason))
+
+
+def _browser_params(a_param: str) -> List[str]:
+    """
+    Split BROWSER_* params, cleaning up common LLM mistakes like url='amazon.com'
+    or selector='input': keep just the values, without parameter names.
+    """
+    cleaned_params = []
+    for p in a_param.split(",", 1):
+        p = p.strip().strip("'\"")
+        # Remove parameter names like "url=", "selector=", "text="
+        if '=' in p:
+            p = p.split('=', 1)[1].strip("'\"")
+        cleaned_params.append(p)
+    return cleaned_params
+
+
+def _browser_navigate(a_param: str, reason: str) -> Action:
+    params = _browser_params(a_param)
+    return BrowserNavigateAction(url=params[0] if params else "", reason=reason)
+
+
+def _browser_click(a_param: str, reason: str) -> Optional[Action]:
+    params = _browser_params(a_param)
+    try:
+        return BrowserClickAction(element_index=int(params[0]) if params else 0, reason=reason)
+    except ValueError:
+        return None  # Skip invalid index
+
+
+def _browser_type(a_param: str, reason: str) -> Optional[Action]:
+    params = _browser_params(a_param)
+    try:
+        index = int(params[0]) if len(params) > 0 else 0
+        text = params[1] if len(params) > 1 else ""
+        return BrowserTypeAction(element_index=index, text=text, reason=reason)
+    except ValueError:
+        return None  # Skip invalid index
+
+
+def _wait(a_param: str, reason: str) -> Action:
+    try:
+        sec = float(a_param) if a_param else 1.0
+    except:
+        sec = 1.0
+    return WaitAction(seconds=sec, reason=reason)
+
+
+def _scroll(a_param: str, reason: str) -> Action:
+    try:
+        # amount can be 'down' or a number. If 'down' we use a default
+        val = -10 if a_param.lower() == "down" else 10 if a_param.lower() == "up" else int(a_param)
+    except:
+        val = -10
+    return ScrollAction(amount=val, reason=reason)
+
+
+# ACTION NAME -> constructor(param, reason); returns None to skip an invalid action
+_CONSTRUCTORS: Dict[str, Callable[[str, str], Optional[Action]]] = {
+    "PRESS_KEY": lambda p, r: PressKeyAction(key=p, reason=r),
+    "TYPE": lambda p, r: TypeAction(text=p, reason=r),
+    "WAIT": _wait,
+    "SCROLL": _scroll,
+    "DONE": lambda p, r: DoneAction(final_answer=p or "Goal reached", reason=r),
+    "FAIL": lambda p, r: FailAction(error=p or "Task failed", reason=r),
+    "BROWSER_NAVIGATE": _browser_navigate,
+    "BROWSER_CLICK": _browser_click,
+    "BROWSER_TYPE": _browser_type,
+}
+
+
+@lru_cache(maxsize=128)
+def _parse_sequence(action_param: str, reason: str) -> tuple:
+    """
+    Memoized core of parse_actions, keyed on the raw planner strings.
+    Cached plans and retry loops hand us the same sequence repeatedly.
+    """
+    # A bare terminal answer (the last step of most runs) needs no splitting or regex
+    whole = action_param.strip().upper()
+    if whole in _TERMINAL:
+        return (_CONSTRUCTORS[whole]("", reason),)
     
     actions = []
     # Split by semicolon, but handle potential whitespace
-    parts = [p.strip() for p in output.action_param.split(";") if p.strip()]
+    parts = [p.strip() for p in action_param.split(";") if p.strip()]
     
     for part in parts:
-        # Check for standalone tokens like DONE or FAIL
-        if part.upper() == "DONE":
-            actions.append(DoneAction(final_answer="Goal reached", reason=output.reason))
-            continue
-        if part.upper() == "FAIL":
-            actions.append(FailAction(error="Task failed", reason=output.reason))
-            continue
-
-        # Regex to match TYPE(param) or TYPE("param") or BROWSER_TYPE(selector, text)
-        match = re.match(r"(\w+)\((.*)\)", part)
-        if not match:
-            continue
-            
-        a_type = match.group(1).upper()
-        a_param = match.group(2).strip("'\"") # Remove quotes
-        
-        # Handle browser actions with multiple parameters
-        if a_type.startswith("BROWSER_"):
-            # Clean up common LLM mistakes like url='amazon.com' or selector='input'
-            # Extract just the values, stripping parameter names if present
-            cleaned_params = []
-            for p in a_param.split(",", 1):
-                p = p.strip().strip("'\"")
-                # Remove parameter names like "url=", "selector=", "text="
-                if '=' in p:
-                    p = p.split('=', 1)[1].strip("'\"")
-                cleaned_params.append(p)
-            
-            if a_type == "BROWSER_NAVIGATE":
-                url = cleaned_params[0] if cleaned_params else ""
-                actions.append(BrowserNavigateAction(url=url, reason=output.reason))
-            elif a_type == "BROWSER_CLICK":
-                try:
-                    index = int(cleaned_params[0]) if cleaned_params else 0
-                    actions.append(BrowserClickAction(element_index=index, reason=output.reason))
-                except ValueError:
-                    pass  # Skip invalid index
-            elif a_type == "BROWSER_TYPE":
-                try:
-                    index = int(cleaned_params[0]) if len(cleaned_params) > 0 else 0
-                    text = cleaned_params[1] if len(cleaned_params) > 1 else ""
-                    actions.append(BrowserTypeAction(element_index=index, text=text, reason=output.reason))
-                except ValueError:
-                    pass  # Skip invalid index
-            continue
+        # Standalone tokens like DONE or FAIL share the parameterized constructors
+        upper = part.upper()
+        if upper in _TERMINAL:
+            a_type, a_param = upper, ""
+        else:
+            # Regex to match TYPE(param) or TYPE("param") or BROWSER_TYPE(selector, text)
+            match = _ACTION_RE.match(part)
+            if not match:
+                continue
+            a_type = match.group(1).upper()
+            a_param = match.group(2).strip("'\"") # Remove quotes
         
-        # Regular desktop actions
-        if a_type == "PRESS_KEY":
-            actions.append(PressKeyAction(key=a_param, reason=output.reason))
-        elif a_type == "TYPE":
-            actions.append(TypeAction(text=a_param, reason=output.reason))
-        elif a_type == "WAIT":
-            try:
-                sec = float(a_param) if a_param else 1.0
-            except:
-                sec = 1.0
-            actions.append(WaitAction(seconds=sec, reason=output.reason))
-        elif a_type == "DONE":
-            actions.append(DoneAction(final_answer=a_param or "Goal reached", reason=output.reason))
-        elif a_type == "SCROLL":
-            try:
-                # amount can be 'down' or a number. If 'down' we use a default
-                val = -10 if a_param.lower() == "down" else 10 if a_param.lower() == "up" else int(a_param)
-            except:
-                val = -10
-            actions.append(ScrollAction(amount=val, reason=output.reason))
-        elif a_type == "FAIL":
-            actions.append(FailAction(error=a_param or "Task failed", reason=output.reason))
+        ctor = _CONSTRUCTORS.get(a_type)
+        action = ctor(a_param, reason) if ctor is not None else None
+        if action is not None:
+            actions.append(action)
             
-    return actions or [FailAction(error=f"Failed to parse sequence: {output.action_param}", reason=output.reason)]
+    return tuple(actions or [FailAction(error=f"Failed to parse sequence: {action_param}", reason=reason)])
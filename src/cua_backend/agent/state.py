@@ -5,9 +5,10 @@ Tracks step count, action history, and execution status.
 
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, List, Optional
 
 
 class AgentStatus(Enum):
@@ -19,9 +20,9 @@ class AgentStatus(Enum):
     FAILED = "failed"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class StepRecord:
-    """Record of a single step in the agent execution."""
+    """Record of a single step in the agent execution (immutable; to_dict() is built once)."""
 
     step: int
     action_type: str
@@ -29,16 +30,20 @@ class StepRecord:
     result_ok: bool
     screenshot_path: Optional[str] = None
     error: Optional[str] = None
+    _dict: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            "step": self.step,
-            "action_type": self.action_type,
-            "action": self.action_data,
-            "result_ok": self.result_ok,
-            "screenshot_path": self.screenshot_path,
-            "error": self.error,
-        }
+        """Dict view of the record. Shared between calls: do not mutate."""
+        if self._dict is None:
+            object.__setattr__(self, "_dict", {
+                "step": self.step,
+                "action_type": self.action_type,
+                "action": self.action_data,
+                "result_ok": self.result_ok,
+                "screenshot_path": self.screenshot_path,
+                "error": self.error,
+            })
+        return self._dict
 
 
 @dataclass
@@ -46,24 +51,94 @@ class AgentState:
     """
     Tracks the current state of the agent during task execution.
     Maintains history for context and logging.
+
+    Step history is stored column-wise (one list per field) so recording a
+    step is a handful of list appends; use to_records() for a row view.
     """
 
     goal: str
     max_steps: int
     step_count: int = 0
     status: AgentStatus = AgentStatus.IDLE
-    history: List[StepRecord] = field(default_factory=list)
+    steps: List[int] = field(default_factory=list)
+    action_types: List[str] = field(default_factory=list)
+    action_data: List[Any] = field(default_factory=list)  # Action models (dumped in to_records) or dicts
+    result_ok: List[bool] = field(default_factory=list)
+    screenshot_paths: List[Optional[str]] = field(default_factory=list)
+    errors: List[Optional[str]] = field(default_factory=list)
     final_answer: Optional[str] = None
     error: Optional[str] = None
+    # Row and dict views of the steps recorded so far; steps are append-only, so each
+    # is built once, on first read, and extended with newer steps only
+    _records: List[StepRecord] = field(default_factory=list, repr=False, compare=False)
+    _step_dicts: List[Dict[str, Any]] = field(default_factory=list, repr=False, compare=False)
+
+    def add_step(self, step: int, action_type: str, action_data: Any,
+                 result_ok: bool, screenshot_path: Optional[str] = None,
+                 error: Optional[str] = None) -> None:
+        """Append a step to history. action_data may be the Action itself; it is dumped on demand."""
+        self.steps.append(step)
+        self.action_types.append(action_type)
+        self.action_data.append(action_data)
+        self.result_ok.append(result_ok)
+        self.screenshot_paths.append(screenshot_path)
+        self.errors.append(error)
+        self.step_count = step
+
+    def to_records(self, start: int = 0) -> List[StepRecord]:
+        """Row view of the history from index `start` onwards (each record built once)."""
+        built = len(self._records)
+        if built < len(self.steps):
+            action_data = [
+                data.model_dump() if hasattr(data, "model_dump") else data
+                for data in self.action_data[built:]
+            ]
+            self._records.extend(
+                StepRecord(*row) for row in zip(
+                    self.steps[built:], self.action_types[built:],
+                    action_data, self.result_ok[built:],
+                    self.screenshot_paths[built:], self.errors[built:],
+                )
+            )
+        return self._records[start:]
 
-    def add_step(self, record: StepRecord) -> None:
-        """Add a step record to history."""
-        self.history.append(record)
-        self.step_count = record.step
+    @property
+    def history(self) -> List[StepRecord]:
+        """All step records. The cached list itself (no copy): do not mutate."""
+        self.to_records(len(self.steps))
+        return self._records
 
-    def get_history_for_llm(self) -> List[Dict[str, Any]]:
-        """Get history formatted for LLM context (last 5 steps)."""
-        return [step.to_dict() for step in self.history[-5:]]
+    def step_dicts(self, start: int = 0) -> List[Dict[str, Any]]:
+        """
+        Dict views of the history from index `start` onwards. Each step is
+        dumped once, on first request, and reused by later calls: do not mutate.
+        """
+        built = len(self._step_dicts)
+        if built < len(self.steps):
+            self._step_dicts.extend(record.to_dict() for record in self.to_records(built))
+        return self._step_dicts[start:]
+
+    def get_history_for_llm(self, max_steps: int = 8, screenshot_keep: int = 2) -> List[Dict[str, Any]]:
+        """
+        Bounded history for LLM context: the last max_steps records, with
+        screenshot paths kept only on the newest screenshot_keep of them and
+        older steps folded into a leading summary entry. The full history
+        stays available through to_dict() for metadata.
+        """
+        start = max(len(self.steps) - max_steps, 0)
+        records = self.step_dicts(start)
+        evict = max(len(records) - screenshot_keep, 0)
+        records[:evict] = [
+            {**record, "screenshot_path": "[evicted]"} if record["screenshot_path"] is not None else record
+            for record in records[:evict]
+        ]
+        if start:
+            failed = [step for step, ok in zip(self.steps[:start], self.result_ok[:start]) if not ok]
+            summary = f"{start} earlier steps archived: {start - len(failed)} ok, {len(failed)} failed"
+            if failed:
+                summary += f", last failure at step {failed[-1]}"
+            records.insert(0, {"summary": summary})
+        return records
 
     def is_terminal(self) -> bool:
         """Check if agent has reached a terminal state."""
@@ -88,5 +163,109 @@ class AgentState:
             "status": self.status.value,
             "final_answer": self.final_answer,
             "error": self.error,
-            "history": [step.to_dict() for step in self.history],
+            "history": self.step_dicts(),
         }
+
+
+@dataclass
+class HistoryEntry:
+    """One planner-facing history line (a step outcome or a free-form note)."""
+
+    step: int
+    payload: Any  # Actions for a step outcome, the message itself for a note
+    ok: bool = True
+    note: str = ""
+    is_step: bool = True
+    first_step: int = 0  # Start of a collapsed failure streak
+    count: int = 1
+    _text: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @property
+    def text(self) -> str:
+        """str(payload), formatted on first render only (repr of Action lists is not cheap)."""
+        if self._text is None:
+            self._text = str(self.payload)
+        return self._text
+
+    def render(self) -> str:
+        if not self.is_step:
+            return self.text
+        if self.count > 1:
+            return (f"Steps {self.first_step}-{self.step}: {self.count} consecutive failures, "
+                    f"last: {self.text} -> {self.note}")
+        return f"Step {self.step}: {self.text} -> {self.note}"
+
+
+class HistoryRing:
+    """
+    Bounded history sent to the planner.
+    Keeps the last few step outcomes verbatim, collapses failure streaks to
+    one line and archives older entries behind a summary, so prompt size
+    (and token cost) stays flat instead of growing with every step.
+    """
+
+    def __init__(self, maxlen: int = 12):
+        self._entries: Deque[HistoryEntry] = deque(maxlen=maxlen)
+        self._checklist: str = ""
+        self._archived_ok = 0
+        self._archived_failed = 0
+        self._last_archived_failure: Optional[int] = None
+
+    def append_step(self, step: int, action: Any, ok: bool, note: str) -> None:
+        """Record the outcome of an executed action sequence."""
+        self._entries.append(HistoryEntry(step=step, payload=action, ok=ok,
+                                          note=note, first_step=step))
+
+    def append_note(self, step: int, note: str) -> None:
+        """Record a free-form hint (e.g. loop-recovery instructions)."""
+        self._entries.append(HistoryEntry(step=step, payload=note, is_step=False))
+
+    def set_checklist(self, sub_goals: str) -> None:
+        """Only the latest planner checklist is relevant; older ones are dropped."""
+        self._checklist = sub_goals
+
+    def collapse_failures(self) -> None:
+        """Merge runs of consecutive failed steps into a single entry."""
+        collapsed: List[HistoryEntry] = []
+        for entry in self._entries:
+            prev = collapsed[-1] if collapsed else None
+            if (prev and prev.is_step and entry.is_step
+                    and not prev.ok and not entry.ok):
+                prev.count += entry.count
+                prev.step, prev.payload, prev.note = entry.step, entry.payload, entry.note
+                prev._text = entry._text
+                continue
+            collapsed.append(entry)
+        if len(collapsed) != len(self._entries):
+            self._entries = deque(collapsed, maxlen=self._entries.maxlen)
+
+    def archive_older_than(self, k: int = 5) -> None:
+        """Move entries older than the last k steps into the summary counters."""
+        if not self._entries:
+            return
+        cutoff = self._entries[-1].step - k
+        while self._entries and self._entries[0].step <= cutoff:
+            entry = self._entries.popleft()
+            if not entry.is_step:
+                continue
+            if entry.ok:
+                self._archived_ok += entry.count
+            else:
+                self._archived_failed += entry.count
+                self._last_archived_failure = entry.step
+
+    def render_for_prompt(self) -> List[str]:
+        lines = []
+        if self._archived_ok or self._archived_failed:
+            summary = (f"(archived earlier steps: {self._archived_ok} ok, "
+                       f"{self._archived_failed} failed")
+            if self._last_archived_failure is not None:
+                summary += f", last failure at step {self._last_archived_failure}"
+            lines.append(summary + ")")
+        if self._checklist:
+            lines.append(f"Checklist: {self._checklist}")
+        lines.extend(entry.render() for entry in self._entries)
+        return lines
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -3,14 +3,41 @@ main.py - Entry point for DeskPilot
 """
 
 import sys
+import asyncio
 import argparse
-from cua_backend.agent import Agent, Planner
+from functools import cached_property
+from pathlib import Path
+from cua_backend.agent import Agent, Planner, PlannerInput, TextState
 from cua_backend.execution import DesktopController
 from cua_backend.schemas.tasks import Task
 
+class LazyVisionClient:
+    """
+    Stand-in for the vision LLM client: the provider SDK is imported and the
+    client built on first use, so text-only runs never pay for it.
+    """
+
+    def __init__(self, model: str):
+        self._model_arg = model
+
+    @cached_property
+    def _client(self):
+        if self._model_arg.startswith("openrouter/"):
+            from cua_backend.llm.openrouter_client import OpenRouterClient
+            return OpenRouterClient(model=self._model_arg)
+        from cua_backend.llm.gemini_client import GeminiClient
+        # Map the dspy model name to the regular gemini format if needed
+        return GeminiClient(model=self._model_arg.replace("gemini/", ""))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):  # Not delegated (and no recursion if building _client fails)
+            raise AttributeError(name)
+        return getattr(self._client, name)
+
+
 def main():
     parser = argparse.ArgumentParser(description="DeskPilot CLI")
-    parser.add_argument("goal", type=str, help="The task for the agent to perform")
+    parser.add_argument("goal", type=str, help="The task for the agent to perform, or a file with one goal per line")
     parser.add_argument("--model", type=str, default="gemini/gemini-2.5-flash", help="DSPy model to use")
     parser.add_argument("--max-steps", type=int, default=10, help="Max steps for the task")
     args = parser.parse_args()
@@ -22,15 +49,7 @@ def main():
     planner.configure(model=args.model)
     
     # 2. Setup Vision fallback
-    vision_client = None
-    if args.model.startswith("openrouter/"):
-        from cua_backend.llm.openrouter_client import OpenRouterClient
-        vision_client = OpenRouterClient(model=args.model)
-    else:
-        from cua_backend.llm.gemini_client import GeminiClient
-        # Map the dspy model name to the regular gemini format if needed
-        gemini_model = args.model.replace("gemini/", "")
-        vision_client = GeminiClient(model=gemini_model)
+    vision_client = LazyVisionClient(args.model)  # Built only if the agent escalates
 
     # Standard desktop controller (PyAutoGUI)
     controller = DesktopController()
@@ -43,25 +62,39 @@ def main():
         runs_dir="runs"
     )
 
-    # 3. Create and Run Task
-    task = Task(goal=args.goal, max_steps=args.max_steps)
-    
-    print(f"🚀 Starting task: {args.goal}")
-    print("-" * 50)
+    # 3. Create and Run Task(s)
+    goal_file = Path(args.goal)
+    if goal_file.is_file():
+        goals = [line.strip() for line in goal_file.read_text().splitlines() if line.strip()]
+        # Plan every goal's first step from the current desktop state in one concurrent
+        # batch; runs that start from this same state then hit the planner cache.
+        start_state = TextState(**controller.get_text_state())
+        print(f"📋 Pre-planning {len(goals)} goals...")
+        asyncio.run(planner.abatch([PlannerInput(goal=g, step=1, text_state=start_state) for g in goals]))
+    else:
+        goals = [args.goal]
     
     try:
-        result = agent.run(task)
-        
-        print("-" * 50)
-        if result.success:
-            print(f"✅ TASK COMPLETE: {result.final_answer}")
-        else:
-            print(f"❌ TASK FAILED: {result.error}")
+        for goal in goals:  # One desktop: tasks run one after another
+            task = Task(goal=goal, max_steps=args.max_steps)
+            
+            print(f"🚀 Starting task: {goal}")
+            print("-" * 50)
+            
+            result = agent.run(task)
+            
+            print("-" * 50)
+            if result.success:
+                print(f"✅ TASK COMPLETE: {result.final_answer}")
+            else:
+                print(f"❌ TASK FAILED: {result.error}")
             
     except KeyboardInterrupt:
         print("\n🛑 Task cancelled by user.")
     except Exception as e:
         print(f"\n💥 Fatal error: {e}")
+    finally:
+        agent.close()  # Flush run metadata still being written in the background
 
 if __name__ == "__main__":
     main()
@@ -15,21 +15,77 @@ Inside Docker, DISPLAY=:99 points to our Xvfb virtual screen.
 
 from __future__ import annotations
 
+import mmap
+import os
+import struct
+import subprocess
+import tempfile
+import threading
 import time
-import pyautogui
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from typing import List, Optional, Tuple
+
 from PIL import Image
 
+# Optional: in-process X11 capture (no scrot fork, no PNG encode/decode round-trip)
+try:
+    import mss
+except ImportError:
+    mss = None
+
 
 # ─────────────────────────────────────────────────────────────
 # CONFIGURATION
 # ─────────────────────────────────────────────────────────────
 
-# PyAutoGUI has a safety feature: move mouse to corner = abort
-# Disable it since we're in a container
-pyautogui.FAILSAFE = False
+class _LazyPyAutoGUI:
+    """
+    Stand-in for the pyautogui module: it connects to $DISPLAY at import time,
+    so it's imported (and configured) on the first call instead - importing
+    this package never needs an X server.
+    """
+
+    @cached_property
+    def _module(self):
+        import pyautogui
+        # PyAutoGUI has a safety feature: move mouse to corner = abort
+        # Disable it since we're in a container
+        pyautogui.FAILSAFE = False
+        # No blanket delay after every call (it added 100 ms to each action of a sequence);
+        # the combos that open launchers/dialogs get an explicit settle delay in press_key,
+        # everything else is paced by the planner's WAITs and the anchor polling
+        pyautogui.PAUSE = 0
+        return pyautogui
+
+    def __getattr__(self, name):
+        if name.startswith("_"):  # Not delegated (and no recursion if the import fails)
+            raise AttributeError(name)
+        return getattr(self._module, name)
+
+
+pyautogui = _LazyPyAutoGUI()
+
+# Normalized combos that open a launcher, dialog or location bar, and the pause after them
+SLOW_COMBOS = frozenset({("alt", "f2"), ("ctrl", "s"), ("ctrl", "o"), ("ctrl", "l")})
+SLOW_COMBO_DELAY = 0.1
 
-# Add tiny delays between actions for stability
-pyautogui.PAUSE = 0.1
+# scrot -q for PNG output: only picks the zlib compression level (80 ~ level 1,
+# the lightest pass); pixels are identical, files slightly larger.
+SCROT_QUALITY = 80
+
+# Xvfb started with `-fbdir <dir>` keeps screen 0 as an XWD file there (see
+# docker/supervisord.conf): reading it is a page-cache read, no X11 round-trip.
+# Opt-in: the file name carries no display number, so only trust it when the
+# environment points us at the fbdir of the server $DISPLAY refers to.
+_XVFB_FBDIR = os.environ.get("XVFB_FBDIR")
+XVFB_SCREEN_FILE = os.path.join(_XVFB_FBDIR, "Xvfb_screen0") if _XVFB_FBDIR else None
+
+# One mss grabber per thread (its X connection isn't shareable), created on first use
+_mss_local = threading.local()
+
+# Writes step artifacts off the capture path when the frame isn't captured by scrot
+_save_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-save")
 
 
 # ─────────────────────────────────────────────────────────────
@@ -61,19 +117,40 @@ def right_click(x: int, y: int) -> None:
     pyautogui.rightClick(x, y)
 
 
-def type_text(text: str, interval: float = 0.02) -> None:
+def type_text(text: str, interval: float = 0.012) -> None:
     """
     Type text character by character.
     
-    WHY interval=0.02?
+    HOW IT WORKS:
+    The whole string goes to a single `xdotool type` call, which streams the
+    keystrokes to the X server itself (and handles non-ASCII text, unlike
+    typewrite). Falls back to PyAutoGUI only where xdotool is not installed:
+    after a timeout or failed exit some of the text may already be typed, so
+    retyping it would duplicate input - those raise instead.
+    
+    WHY interval=0.012?
     Too fast and some apps miss keystrokes.
-    0.02 seconds per char = 50 chars/second = fast but reliable.
+    12 ms is xdotool's own default delay: ~80 chars/second, still reliable.
     
     Args:
         text: String to type
         interval: Delay between each character
     """
-    pyautogui.typewrite(text, interval=interval)
+    delay_ms = str(max(int(interval * 1000), 0))
+    try:
+        result = subprocess.run(
+            ["xdotool", "type", "--delay", delay_ms, "--", text],
+            capture_output=True,
+            timeout=10 + len(text) * interval,
+        )
+    except FileNotFoundError:
+        pyautogui.typewrite(text, interval=interval)
+        return
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"xdotool type timed out on {len(text)} chars (text may be partially typed)")
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors="replace").strip()
+        raise RuntimeError(f"xdotool type failed ({result.returncode}): {stderr}")
 
 
 # Key name mapping: X11/LLM names → PyAutoGUI names
@@ -119,16 +196,24 @@ KEY_NAME_MAP = {
 }
 
 
+@lru_cache(maxsize=256)
 def normalize_key(key: str) -> str:
     """
     Normalize a key name to PyAutoGUI format.
     
     Maps X11 names (Super_L, Control) to PyAutoGUI names (win, ctrl).
+    Memoized: plans repeat the same few keys (Enter, Ctrl+L, Ctrl+S...).
     """
     key_lower = key.lower().strip()
     return KEY_NAME_MAP.get(key_lower, key_lower)
 
 
+@lru_cache(maxsize=256)
+def _split_combo(key: str) -> Tuple[str, ...]:
+    """'Control+L' -> ('ctrl', 'l'), memoized per raw combo string."""
+    return tuple(normalize_key(k) for k in key.split("+"))
+
+
 def press_key(key: str) -> None:
     """
     Press a special key or key combination.
@@ -146,14 +231,24 @@ def press_key(key: str) -> None:
     """
     if "+" in key:
         # It's a combo like "ctrl+c" or "Control+L"
-        keys = [normalize_key(k) for k in key.split("+")]
-        pyautogui.hotkey(*keys)
+        combo = _split_combo(key)
+        pyautogui.hotkey(*combo)
+        if combo in SLOW_COMBOS:
+            time.sleep(SLOW_COMBO_DELAY)
     else:
         # Single key
         normalized = normalize_key(key)
         pyautogui.press(normalized)
 
 
+def press_keys(keys: List[str]) -> None:
+    """
+    Press several single keys in order with one PyAutoGUI call.
+    Combos go through press_key (they need hotkey() and the settle delay).
+    """
+    pyautogui.press([normalize_key(k) for k in keys])
+
+
 def scroll(amount: int) -> None:
     """
     Scroll the mouse wheel.
@@ -182,42 +277,104 @@ def drag(start_x: int, start_y: int, end_x: int, end_y: int, duration: float = 0
     pyautogui.drag(end_x - start_x, end_y - start_y, duration=duration)
 
 
-def screenshot() -> Image.Image:
+def _grab_mss() -> Image.Image:
+    """Grab the whole X screen with a reused mss instance (raw BGRA -> RGB in C)."""
+    sct = getattr(_mss_local, "sct", None)
+    if sct is None:
+        sct = _mss_local.sct = mss.mss()
+        _mss_local.monitor = sct.monitors[0]  # All monitors combined, same area as scrot
+    raw = sct.grab(_mss_local.monitor)
+    return Image.frombytes("RGB", raw.size, raw.bgra, "raw", "BGRX")
+
+
+def _grab_xvfb() -> Optional[Image.Image]:
+    """
+    Read the Xvfb framebuffer file directly, or None if it is unavailable.
+    XWD layout: big-endian header (header_size, ..., ncolors), colormap
+    (12 bytes per entry), then the pixel rows.
+    """
+    if XVFB_SCREEN_FILE is None:
+        return None
+    try:
+        with open(XVFB_SCREEN_FILE, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    with buf:
+        header = struct.unpack(">25I", buf[:100])
+        header_size, pixmap_format = header[0], header[2]
+        width, height, byte_order = header[4], header[5], header[7]
+        bits_per_pixel, bytes_per_line, ncolors = header[11], header[12], header[19]
+        if pixmap_format != 2 or bits_per_pixel != 32:  # Only 32bpp ZPixmap (depth 24)
+            return None
+        offset = header_size + ncolors * 12
+        pixels = buf[offset:offset + bytes_per_line * height]  # One memcpy: a stable snapshot
+    raw_mode = "BGRX" if byte_order == 0 else "XRGB"  # LSBFirst / MSBFirst
+    return Image.frombytes("RGB", (width, height), pixels, "raw", raw_mode, bytes_per_line, 1)
+
+
+def screenshot(save_path: Optional[str] = None) -> Image.Image:
     """
     Capture the current screen.
     
+    Args:
+        save_path: If given, the PNG is also persisted here, encoded exactly once:
+                   by scrot itself, or on a background thread for in-process
+                   captures (the file may land shortly after this returns).
+    
     Returns:
         PIL Image object of the screenshot
         
     HOW IT WORKS:
-    Uses scrot directly on Linux (more reliable than PyAutoGUI's pyscreeze).
+    Reads Xvfb's framebuffer file when XVFB_FBDIR names the server's -fbdir (no X11 at all).
+    Then mss when installed (reads the framebuffer in-process, no encode/decode).
+    Otherwise scrot directly on Linux (more reliable than PyAutoGUI's pyscreeze).
     Falls back to PyAutoGUI on other platforms.
     """
-    import subprocess
-    import tempfile
-    import os
+    img = _grab_xvfb()
+    if img is not None:
+        if save_path:
+            _save_pool.submit(img.save, save_path, optimize=False, compress_level=1)
+        return img
+    
+    if mss is not None:
+        try:
+            img = _grab_mss()
+            if save_path:
+                _save_pool.submit(img.save, save_path, optimize=False, compress_level=1)
+            return img
+        except Exception:
+            pass  # Fall through to scrot
     
-    # Try scrot first (Linux/Docker)
+    # Try scrot (Linux/Docker)
     try:
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
-            tmp_path = f.name
+        if save_path:
+            out_path = os.fspath(save_path)
+        else:
+            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
+                out_path = f.name
         
         result = subprocess.run(
-            ['scrot', '-o', tmp_path],
+            ['scrot', '-o', '-q', str(SCROT_QUALITY), out_path],
             capture_output=True,
             timeout=5,
         )
         
-        if result.returncode == 0 and os.path.exists(tmp_path):
-            img = Image.open(tmp_path)
+        if result.returncode == 0 and os.path.exists(out_path):
+            img = Image.open(out_path)
             img.load()  # Load into memory
-            os.unlink(tmp_path)  # Delete temp file
+            if not save_path:
+                os.unlink(out_path)  # Delete temp file
             return img
     except (subprocess.SubprocessError, FileNotFoundError, OSError):
         pass  # Fall through to PyAutoGUI
     
     # Fallback to PyAutoGUI
-    return pyautogui.screenshot()
+    img = pyautogui.screenshot()
+    if save_path:
+        # Callers use the in-memory image; the artifact can land a moment later
+        _save_pool.submit(img.save, save_path, optimize=False, compress_level=1)
+    return img
 
 
 def wait(seconds: float) -> None:
@@ -5,7 +5,10 @@ Handles navigation, clicking, typing in Chrome browser using index-based element
 from typing import Dict, Any
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeout
 
-from ..utils.constants import FIND_ELEMENTS_JS
+from ..utils.constants import BROWSER_HELPERS_JS
+
+# Returns None when the helpers are missing from the current document
+CALL_HELPER_JS = "([name, idx]) => window[name] ? window[name](idx) : null"
 
 
 class BrowserController:
@@ -14,6 +17,20 @@ class BrowserController:
     def __init__(self, page: Page):
         """Initialize with connected Playwright page."""
         self._page = page
+        self._helpers_installed = False
+    
+    async def _call_helper(self, name: str, index: int):
+        """Run one of the BROWSER_HELPERS_JS functions against element `index`."""
+        if not self._helpers_installed:
+            # Init script covers every later document; evaluate covers the current one
+            await self._page.add_init_script(BROWSER_HELPERS_JS)
+            await self._page.evaluate(BROWSER_HELPERS_JS)
+            self._helpers_installed = True
+        result = await self._page.evaluate(CALL_HELPER_JS, [name, index])
+        if result is None:
+            await self._page.evaluate(BROWSER_HELPERS_JS)
+            result = await self._page.evaluate(CALL_HELPER_JS, [name, index])
+        return result
     
     async def navigate(self, url: str, timeout: int = 30000) -> Dict[str, Any]:
         """Navigate to URL. Auto-adds https:// if no protocol specified."""
@@ -36,14 +53,7 @@ class BrowserController:
     async def click_element(self, index: int, timeout: int = 5000) -> Dict[str, Any]:
         """Click element by its index from the interactive elements list."""
         try:
-            clicked = await self._page.evaluate(
-                "((idx) => {" + FIND_ELEMENTS_JS + """
-                    if (idx >= allEls.length) return false;
-                    allEls[idx].click();
-                    return true;
-                })""",
-                index
-            )
+            clicked = await self._call_helper("__dpClick", index)
             if not clicked:
                 return {"success": False, "error": f"Index {index} out of range"}
             
@@ -67,18 +77,16 @@ class BrowserController:
     async def type_into_element(self, index: int, text: str, timeout: int = 5000) -> Dict[str, Any]:
         """Click element by index to focus, then type text. Does NOT auto-submit."""
         try:
-            focused = await self._page.evaluate(
-                "((idx) => {" + FIND_ELEMENTS_JS + """
-                    if (idx >= allEls.length) return false;
-                    allEls[idx].focus();
-                    allEls[idx].click();
-                    return true;
-                })""",
-                index
-            )
+            focused = await self._call_helper("__dpFocusClick", index)
             if not focused:
                 return {"success": False, "error": f"Index {index} out of range"}
-            await self._page.keyboard.type(text, delay=50)
+            # One Input.insertText instead of per-key events with a 50ms gap
+            before = await self._call_helper("__dpTargetValue", index)
+            await self._page.keyboard.insert_text(text)
+            if (text and before is not False
+                    and await self._call_helper("__dpTargetValue", index) == before):
+                # Widget ignored the insert (keydown-driven input): type real keys
+                await self._page.keyboard.type(text)
             return {"success": True, "index": index, "text_length": len(text)}
         except Exception as e:
             # Navigation during typing is OK
@@ -14,13 +14,25 @@ Tomorrow we could swap this for a Windows controller or a web controller.
 
 from __future__ import annotations
 
+import re
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from PIL import Image
 import asyncio
 
+# Optional: in-process X11 queries over one connection (installed with pyautogui on Linux)
+try:
+    from Xlib import X, display as xdisplay
+except ImportError:
+    xdisplay = None
+
+# Quoted names in xprop's WM_CLASS output: WM_CLASS(STRING) = "instance", "ClassName"
+_WM_CLASS_RE = re.compile(r'"([^"]*)"')
+
 
 # ─────────────────────────────────────────────────────────────
 # DATA STRUCTURES FOR STATE READING
@@ -40,6 +52,7 @@ from .actions import (
     double_click,
     type_text,
     press_key,
+    press_keys,
     scroll,
     screenshot as take_screenshot,
     wait,
@@ -92,15 +105,26 @@ class DesktopController(Executor):
         # Browser integration (lazy-loaded)
         self._browser_provider = None
         self._browser_controller = None
+        
+        # Persistent X connection for window queries (opened on first use)
+        self._xconn: Optional[tuple] = None  # (display, atoms dict)
+        self._xconn_failed = xdisplay is None
+        self._xlock = threading.Lock()
+        
+        # Captures the screen while observe() reads the text state on the caller's thread
+        self._capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
     
-    def screenshot(self) -> Image.Image:
+    def screenshot(self, save_to: Optional[str] = None) -> Image.Image:
         """
         Capture the current desktop.
         
+        Args:
+            save_to: Optional path to persist the PNG (encoded once, by scrot).
+        
         Returns:
             PIL Image of the screen (1280x720 by default)
         """
-        return take_screenshot()
+        return take_screenshot(save_to)
     
     def execute(self, action: Action) -> ExecutionResult:
         """
@@ -159,6 +183,56 @@ class DesktopController(Executor):
             # Catch any PyAutoGUI errors
             return ExecutionResult(ok=False, error=str(e))
     
+    def execute_batch(self, actions: List[Action]) -> List[ExecutionResult]:
+        """
+        Perform a planned sequence, merging runs that can go out as one call.
+        
+        Consecutive TYPEs become one type_text (one xdotool fork), consecutive
+        single-key PRESS_KEYs one press_keys, consecutive WAITs one sleep.
+        Everything else goes through execute().
+        
+        Returns:
+            One ExecutionResult per action (a merged run shares its result)
+        """
+        results: List[ExecutionResult] = []
+        i = 0
+        while i < len(actions):
+            kind = self._batch_kind(actions[i])
+            j = i + 1
+            if kind is not None:
+                while j < len(actions) and self._batch_kind(actions[j]) == kind:
+                    j += 1
+            if j - i == 1:
+                results.append(self.execute(actions[i]))
+            else:
+                results.extend([self._execute_run(kind, actions[i:j])] * (j - i))
+            i = j
+        return results
+    
+    @staticmethod
+    def _batch_kind(action: Action) -> Optional[str]:
+        """Which mergeable run an action can join, or None."""
+        if isinstance(action, TypeAction):
+            return "type"
+        if isinstance(action, PressKeyAction) and "+" not in action.key:
+            return "key"
+        if isinstance(action, WaitAction):
+            return "wait"
+        return None
+    
+    def _execute_run(self, kind: str, run: List[Action]) -> ExecutionResult:
+        """Perform a run of same-kind actions as a single call."""
+        try:
+            if kind == "type":
+                type_text("".join(a.text for a in run))
+            elif kind == "key":
+                press_keys([a.key for a in run])
+            else:
+                wait(sum(a.seconds for a in run))
+            return ExecutionResult(ok=True)
+        except Exception as e:
+            return ExecutionResult(ok=False, error=str(e))
+    
     # ─────────────────────────────────────────────────────────────
     # PRIVATE HANDLER METHODS
     # Each one translates an Action object into raw PyAutoGUI calls
@@ -238,14 +312,55 @@ class DesktopController(Executor):
     # These methods read desktop state WITHOUT using vision
     # ─────────────────────────────────────────────────────────────
 
+    def _x(self) -> Optional[tuple]:
+        """(display, atoms) of the persistent X connection, or None if unavailable."""
+        if self._xconn is None and not self._xconn_failed:
+            try:
+                d = xdisplay.Display()
+                atoms = {name: d.intern_atom(name) for name in
+                         ("_NET_ACTIVE_WINDOW", "_NET_CLIENT_LIST", "_NET_WM_NAME", "UTF8_STRING")}
+                self._xconn = (d, atoms)
+            except Exception:
+                self._xconn_failed = True  # No X / no python-xlib: use the CLI tools
+        return self._xconn
+    
+    @staticmethod
+    def _x_window_info(d, atoms: dict, wid: int, is_active: bool) -> WindowInfo:
+        """Title (_NET_WM_NAME, else WM_NAME) and WM_CLASS class name of one window."""
+        win = d.create_resource_object("window", wid)
+        name = win.get_full_property(atoms["_NET_WM_NAME"], atoms["UTF8_STRING"])
+        title = name.value if name else (win.get_wm_name() or "")
+        if isinstance(title, bytes):
+            title = title.decode("utf-8", "replace")
+        wm_class = win.get_wm_class() or ()
+        app_name = wm_class[1] if len(wm_class) >= 2 else (wm_class[0] if wm_class else "")
+        return WindowInfo(window_id=str(wid), title=title, app_name=app_name, is_active=is_active)
+    
+    def _x_active_id(self, d, atoms: dict) -> int:
+        prop = d.screen().root.get_full_property(atoms["_NET_ACTIVE_WINDOW"], X.AnyPropertyType)
+        return int(prop.value[0]) if prop and len(prop.value) else 0
+    
     def get_active_window(self) -> Optional[WindowInfo]:
         """
         Get information about the currently focused window.
-        Uses xdotool to query the active window and xprop for the class.
+        Reads _NET_ACTIVE_WINDOW, the title and WM_CLASS over a persistent X
+        connection (no process spawns); falls back to xdotool + xprop.
         
         Returns:
             WindowInfo with window_id, title, app_name, or None if failed
         """
+        x = self._x()
+        if x is not None:
+            try:
+                with self._xlock:
+                    wid = self._x_active_id(*x)
+                    return self._x_window_info(*x, wid, True) if wid else None
+            except Exception:
+                pass  # e.g. the window closed mid-query: ask the CLI tools
+        return self._get_active_window_cli()
+    
+    def _get_active_window_cli(self) -> Optional[WindowInfo]:
+        """get_active_window() via xdotool (id, title) and xprop (WM_CLASS)."""
         try:
             # Get active window ID
             result = subprocess.run(
@@ -277,8 +392,7 @@ class DesktopController(Executor):
                     # Parse: WM_CLASS(STRING) = "instance", "ClassName"
                     parts = class_result.stdout.split("=", 1)[1].strip()
                     # Extract class names from quoted strings
-                    import re
-                    names = re.findall(r'"([^"]*)"', parts)
+                    names = _WM_CLASS_RE.findall(parts)
                     if len(names) >= 2:
                         app_name = names[1]  # ClassName (e.g., "Thunar")
                     elif len(names) == 1:
@@ -298,11 +412,29 @@ class DesktopController(Executor):
     def get_window_list(self) -> List[WindowInfo]:
         """
         Get list of all open windows.
-        Uses wmctrl to enumerate windows and xdotool for class names.
+        Reads _NET_CLIENT_LIST (the list wmctrl prints) and each window's title
+        and class over the persistent X connection; falls back to wmctrl + xprop.
         
         Returns:
             List of WindowInfo objects for each open window
         """
+        x = self._x()
+        if x is not None:
+            try:
+                with self._xlock:
+                    d, atoms = x
+                    prop = d.screen().root.get_full_property(atoms["_NET_CLIENT_LIST"], X.AnyPropertyType)
+                    active_id = self._x_active_id(d, atoms)
+                    return [
+                        self._x_window_info(d, atoms, int(wid), int(wid) == active_id)
+                        for wid in (prop.value if prop else ())
+                    ]
+            except Exception:
+                pass  # e.g. a window closed mid-query: ask the CLI tools
+        return self._get_window_list_cli()
+    
+    def _get_window_list_cli(self) -> List[WindowInfo]:
+        """get_window_list() via wmctrl -l and one xprop WM_CLASS call per window."""
         windows = []
         try:
             # wmctrl -l: list windows with format "ID DESKTOP HOST TITLE"
@@ -334,8 +466,7 @@ class DesktopController(Executor):
                             capture_output=True, text=True, timeout=1
                         )
                         if class_result.returncode == 0 and "=" in class_result.stdout:
-                            import re
-                            names = re.findall(r'"([^"]*)"', class_result.stdout)
+                            names = _WM_CLASS_RE.findall(class_result.stdout)
                             if len(names) >= 2:
                                 app_name = names[1]
                             elif len(names) == 1:
@@ -355,6 +486,25 @@ class DesktopController(Executor):
         
         return windows
 
+    def observe(self, save_to: Optional[str] = None) -> Tuple[Image.Image, dict]:
+        """
+        OBSERVE phase in one call: screenshot + text state.
+        
+        The capture (scrot subprocess) runs in a worker thread while the
+        xdotool/CDP state is read here, so the step pays max(capture, state)
+        instead of the sum. The text state stays on the calling thread because
+        the CDP connection is not safe to drive from another thread.
+        
+        Args:
+            save_to: Optional path to persist the screenshot PNG.
+        
+        Returns:
+            (screenshot, text_state dict)
+        """
+        capture = self._capture_pool.submit(self.screenshot, save_to)
+        text_state = self.get_text_state()
+        return capture.result(), text_state
+
     def get_text_state(self):
         """
         Collect all text-based state for the OBSERVE phase.
@@ -367,8 +517,8 @@ class DesktopController(Executor):
             "focused_element": "",  # TODO: implement AT-SPI query
         }
         
-        # Add browser state if Chrome is active
-        if self.is_browser_active():
+        # Add browser state if Chrome is active (reuse the window we already queried)
+        if self._is_browser_window(active):
             browser_state = self.get_browser_state()
             if browser_state:
                 state["current_url"] = browser_state.url
@@ -379,9 +529,43 @@ class DesktopController(Executor):
         
         return state
     
+    def get_window_meta(self) -> dict:
+        """
+        Lightweight subset of get_text_state(): active window title/app and,
+        for Chrome, the current URL. Skips the CDP DOM scans (focused element,
+        page text, interactive elements), so it is cheap enough for polling.
+        """
+        active = self.get_active_window()
+        meta = {
+            "active_app": active.app_name if active else "",
+            "window_title": active.title if active else "",
+        }
+        if self._is_browser_window(active):
+            url = self._get_current_url()
+            if url is not None:
+                meta["current_url"] = url
+                meta["is_browser"] = True
+        return meta
+    
+    def _get_current_url(self) -> Optional[str]:
+        """Current browser URL, connecting over CDP first if needed."""
+        try:
+            if not self._browser_controller:
+                import nest_asyncio
+                nest_asyncio.apply()
+                if not asyncio.run(self._ensure_browser_connected()):
+                    return None
+            return self._browser_provider.current_url()
+        except Exception:
+            return None
+    
     def is_browser_active(self) -> bool:
         """Check if Chrome browser is currently active."""
-        active = self.get_active_window()
+        return self._is_browser_window(self.get_active_window())
+    
+    @staticmethod
+    def _is_browser_window(active: Optional[WindowInfo]) -> bool:
+        """Check if the given window is Chrome/Chromium."""
         if not active:
             return False
         # Check both app_name and window_title for Chrome
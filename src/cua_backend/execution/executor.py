@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 from PIL import Image
 
 from ..schemas.actions import Action
@@ -29,3 +29,7 @@ class Executor(ABC):
     def execute(self, action: Action) -> ExecutionResult:
         """Perform one action: click/type/scroll/etc."""
         raise NotImplementedError
+
+    def execute_batch(self, actions: List[Action]) -> List[ExecutionResult]:
+        """Perform a planned sequence; one result per action."""
+        return [self.execute(action) for action in actions]
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from PIL import Image
 
 from ..schemas.actions import Action
@@ -27,12 +28,32 @@ class LLMClient(ABC):
     @abstractmethod
     def get_next_action(
         self,
-        screenshot: Image.Image,
+        screenshot: Union[Image.Image, bytes],
         goal: str,
         history: Optional[List[Dict[str, Any]]] = None,
+        image_detail: str = "low",
     ) -> Action:
         """
-        Input: screenshot + goal + small history
+        Input: screenshot (PIL image or pre-encoded JPEG bytes) + goal + small history
         Output: ONE Action (from schemas/actions.py)
+
+        image_detail: "low" or "high" - how much visual detail the provider
+        should spend tokens on (where the provider supports it).
         """
         raise NotImplementedError
+
+    async def get_next_action_async(
+        self,
+        screenshot: Union[Image.Image, bytes],
+        goal: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        image_detail: str = "low",
+    ) -> Action:
+        """
+        Awaitable get_next_action, so many requests can be in flight from one
+        event loop. Providers with a native async SDK can override this; the
+        default runs the blocking call in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self.get_next_action, screenshot, goal, history, image_detail
+        )
@@ -5,12 +5,11 @@ Takes screenshot + goal + history, returns validated Action JSON.
 
 from __future__ import annotations
 
-import base64
 import io
 import json
 import os
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from PIL import Image
 
@@ -72,13 +71,17 @@ class GeminiClient(LLMClient):
 
     def get_next_action(
         self,
-        screenshot: Image.Image,
+        screenshot: Union[Image.Image, bytes],
         goal: str,
         history: Optional[List[Dict[str, Any]]] = None,
+        image_detail: str = "low",
     ) -> Action:
         """
         Send screenshot + goal to Gemini, parse and validate the action JSON.
         Retries up to MAX_RETRIES times if JSON parsing or validation fails.
+
+        Gemini has no per-request detail knob here; the token cost is driven
+        by the resolution of the image we send, so image_detail is ignored.
         """
         user_message = build_user_message(goal, history)
         image_part = self._encode_image(screenshot)
@@ -108,18 +111,25 @@ class GeminiClient(LLMClient):
             f"Last error: {last_error}"
         )
 
-    def _encode_image(self, image: Image.Image) -> dict:
-        """Convert PIL Image to base64 for Gemini API."""
-        buffer = io.BytesIO()
-        # Convert to RGB if necessary (handles RGBA, etc.)
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        image.save(buffer, format="JPEG", quality=85)
-        image_bytes = buffer.getvalue()
+    def _encode_image(self, image: Union[Image.Image, bytes]) -> dict:
+        """
+        Inline image part for the Gemini API from a PIL Image or already-encoded
+        JPEG bytes. The raw bytes are handed to the SDK as-is: base64-encoding
+        them here would only add a copy (and a str) per step.
+        """
+        if isinstance(image, bytes):
+            image_bytes = image
+        else:
+            buffer = io.BytesIO()
+            # Convert to RGB if necessary (handles RGBA, etc.)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(buffer, format="JPEG", quality=85)
+            image_bytes = buffer.getvalue()
 
         return {
             "mime_type": "image/jpeg",
-            "data": base64.b64encode(image_bytes).decode("utf-8"),
+            "data": image_bytes,
         }
 
     def _parse_action(self, raw_text: str) -> Action:
@@ -10,7 +10,7 @@ from __future__ import annotations
 import os
 import base64
 from io import BytesIO
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from PIL import Image
 
 import litellm
@@ -44,9 +44,10 @@ class OpenRouterClient(LLMClient):
 
     def get_next_action(
         self,
-        screenshot: Image.Image,
+        screenshot: Union[Image.Image, bytes],
         goal: str,
         history: Optional[List[Dict[str, Any]]] = None,
+        image_detail: str = "low",
     ) -> Action:
         """
         Vision request via OpenRouter.
@@ -54,10 +55,15 @@ class OpenRouterClient(LLMClient):
         """
         from .prompt_templates import SYSTEM_PROMPT, build_user_message
 
-        # Convert PIL to Base64
-        buffered = BytesIO()
-        screenshot.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        # Pre-encoded bytes are JPEG (see perception.prepare_vision_image)
+        if isinstance(screenshot, bytes):
+            mime_type = "image/jpeg"
+            img_str = base64.b64encode(screenshot).decode("utf-8")
+        else:
+            buffered = BytesIO()
+            screenshot.save(buffered, format="PNG")
+            mime_type = "image/png"
+            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
 
         user_message = build_user_message(goal, history)
 
@@ -69,7 +75,10 @@ class OpenRouterClient(LLMClient):
                     {"type": "text", "text": user_message},
                     {
                         "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{img_str}"}
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{img_str}",
+                            "detail": image_detail,
+                        }
                     },
                 ],
             }
@@ -54,6 +54,11 @@ def build_user_message(goal: str, history: list | None = None) -> str:
         parts.append("\nRECENT ACTIONS:")
         # Show last 5 actions max to keep context manageable
         for i, entry in enumerate(history[-5:], 1):
+            # Free-text entries: archived-steps summary, verification context
+            text = entry.get("summary") or entry.get("note")
+            if text:
+                parts.append(f"{i}. {text}")
+                continue
             action_type = entry.get("action", {}).get("type", "UNKNOWN")
             reason = entry.get("action", {}).get("reason", "")
             result = "OK" if entry.get("result_ok", False) else "FAILED"
@@ -1,6 +1,11 @@
 """Perception module for the Computer Use Agent."""
 
-from .screenshot import capture_screenshot, save_screenshot
+from .screenshot import (
+    capture_screenshot,
+    save_screenshot,
+    prepare_vision_image,
+    scale_action_to_screen,
+)
 
 # Browser state (optional - graceful import)
 try:
@@ -8,6 +13,8 @@ try:
     __all__ = [
         "capture_screenshot",
         "save_screenshot",
+        "prepare_vision_image",
+        "scale_action_to_screen",
         "BrowserState",
         "BrowserStateProvider",
     ]
@@ -16,4 +23,6 @@ except ImportError:
     __all__ = [
         "capture_screenshot",
         "save_screenshot",
+        "prepare_vision_image",
+        "scale_action_to_screen",
     ]
@@ -8,10 +8,11 @@ Gives agent "browser vision" - URL, focused elements, interactive elements, etc.
 from __future__ import annotations
 import asyncio
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional, List
 from playwright.async_api import async_playwright, Browser, Page
 
-from ..utils.constants import FIND_ELEMENTS_JS
+from ..utils.constants import SNAPSHOT_ELEMENTS_JS
 
 
 @dataclass
@@ -33,45 +34,55 @@ class BrowserState:
         if not self.interactive_elements:
             return "No interactive elements visible."
         
-        close_keywords = ['close', 'dismiss', 'accept', 'got it', 'ok', '×', '✕', 'x']
-        
-        lines = []
-        for el in self.interactive_elements:
-            tag = el['tag'].upper()
-            text = el['text'] or el['name'] or el['type'] or ''
-            extra = f' -> {el["href"]}' if el['href'] else ''
-            role = el.get('role', '')
-            text_lower = text.lower().strip()
-            
-            # Detect dropdown suggestion items
-            is_dropdown = role in ('option', 'menuitem')
-            
-            # Detect popup close buttons
-            is_likely_close = (
-                text_lower in close_keywords or 
-                any(kw in text_lower for kw in ['close', 'dismiss', 'accept']) or
-                text.strip() in ['×', '✕', 'X']
-            )
-            
-            # Detect search/combobox inputs
-            is_search_input = (
-                tag in ['INPUT', 'TEXTAREA'] and
-                (el.get('type') == 'search' or 
-                 'search' in el.get('name', '').lower() or
-                 'search' in text_lower or
-                 role == 'combobox')
+        # Most elements survive from one step to the next: each distinct line is built once
+        return "\n".join(
+            _format_element(
+                el["index"], el["tag"], el["text"] or el["name"] or el["type"] or "",
+                el["href"], el.get("role", ""), el.get("type"), el.get("name", ""),
             )
-            
-            marker = ''
-            if is_dropdown:
-                marker = ' [DROPDOWN_OPTION]'
-            elif is_likely_close:
-                marker = ' [POPUP_CLOSER?]'
-            elif is_search_input:
-                marker = ' [SEARCH_INPUT]'
-            
-            lines.append(f'[{el["index"]}] <{tag}> "{text}"{extra}{marker}')
-        return "\n".join(lines)
+            for el in self.interactive_elements
+        )
+
+
+_CLOSE_KEYWORDS = frozenset(['close', 'dismiss', 'accept', 'got it', 'ok', '×', '✕', 'x'])
+
+
+@lru_cache(maxsize=2048)
+def _format_element(index: int, tag: str, text: str, href: str, role: str,
+                    el_type: Optional[str], name: str) -> str:
+    """One '[i] <TAG> "text" -> href [MARKER]' line (memoized on the element's fields)."""
+    tag = tag.upper()
+    extra = f' -> {href}' if href else ''
+    text_lower = text.lower().strip()
+    
+    # Detect dropdown suggestion items
+    is_dropdown = role in ('option', 'menuitem')
+    
+    # Detect popup close buttons
+    is_likely_close = (
+        text_lower in _CLOSE_KEYWORDS or 
+        any(kw in text_lower for kw in ['close', 'dismiss', 'accept']) or
+        text.strip() in ['×', '✕', 'X']
+    )
+    
+    # Detect search/combobox inputs
+    is_search_input = (
+        tag in ['INPUT', 'TEXTAREA'] and
+        (el_type == 'search' or 
+         'search' in name.lower() or
+         'search' in text_lower or
+         role == 'combobox')
+    )
+    
+    marker = ''
+    if is_dropdown:
+        marker = ' [DROPDOWN_OPTION]'
+    elif is_likely_close:
+        marker = ' [POPUP_CLOSER?]'
+    elif is_search_input:
+        marker = ' [SEARCH_INPUT]'
+    
+    return f'[{index}] <{tag}> "{text}"{extra}{marker}'
 
 
 class BrowserStateProvider:
@@ -124,6 +135,10 @@ class BrowserStateProvider:
         
         return False
     
+    def current_url(self) -> Optional[str]:
+        """URL of the tracked page (kept locally by Playwright - no CDP round-trip)."""
+        return self._page.url if self._page else None
+    
     async def get_state(self) -> Optional[BrowserState]:
         """Extract current page state."""
         if not self._page:
@@ -183,7 +198,7 @@ class BrowserStateProvider:
         """Extract visible interactive elements in viewport with indices."""
         try:
             elements = await self._page.evaluate(
-                "(() => {" + FIND_ELEMENTS_JS + """
+                "(() => {" + SNAPSHOT_ELEMENTS_JS + """
                     return allEls.map((el, i) => ({
                         index: i,
                         tag: el.tagName.toLowerCase(),
@@ -6,27 +6,69 @@ Used for "Are We There Yet?" local goal verification.
 """
 
 from __future__ import annotations
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import List
 from PIL import Image
 import pytesseract
 
+# Recent OCR results keyed by screenshot content hash (LRU). Shared by every agent
+# in the process (same pixels, same text), so it is locked and never cleared per run.
+_OCR_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+_OCR_CACHE_SIZE = 32
+_OCR_LOCK = threading.Lock()
+
 def get_text_from_image(image: Image.Image) -> str:
     """Extract all text from a PIL image using Tesseract."""
     try:
+        # Tesseract binarizes a grayscale copy anyway; converting here (C code in PIL)
+        # means pytesseract encodes/ships 1 channel instead of 3-4 to the subprocess.
+        if image.mode != "L":
+            image = image.convert("L")
         # We use a simple config for better speed
-        return pytesseract.image_to_string(image).strip()
+        text = pytesseract.image_to_string(image)
+        # Collapse Tesseract's layout whitespace (blank lines, column gaps) in one
+        # C-level split/join: shorter text for every marker scan, and phrases
+        # wrapped across lines still match.
+        return " ".join(text.split())
     except Exception as e:
         print(f"OCR Error: {e}")
         return ""
 
+def image_key(image: Image.Image) -> bytes:
+    """Fast content hash of a screenshot (blake2b is ~2x faster than sha256)."""
+    return hashlib.blake2b(image.tobytes(), digest_size=8).digest()
+
+def get_text_from_image_cached(key: bytes, image: Image.Image) -> str:
+    """
+    Same as get_text_from_image, but memoized by image_key(image).
+    Identical frames (retries, repeated checks in one step) skip Tesseract.
+    """
+    with _OCR_LOCK:
+        text = _OCR_CACHE.get(key)
+        if text is not None:
+            _OCR_CACHE.move_to_end(key)
+            return text
+    text = get_text_from_image(image)  # Tesseract runs outside the lock
+    with _OCR_LOCK:
+        _OCR_CACHE[key] = text
+        if len(_OCR_CACHE) > _OCR_CACHE_SIZE:
+            _OCR_CACHE.popitem(last=False)
+    return text
+
+def clear_ocr_cache() -> None:
+    """Drop all cached OCR results (e.g. to free memory; results never go stale)."""
+    with _OCR_LOCK:
+        _OCR_CACHE.clear()
+
 def check_text_exists(image: Image.Image, keywords: List[str]) -> bool:
     """
     Check if any of the keywords exist on the screen.
     Case-insensitive.
     """
-    text = get_text_from_image(image).lower()
+    text = get_text_from_image_cached(image_key(image), image).lower()
     for kw in keywords:
         if kw.lower() in text:
             return True
     return False
-
@@ -5,6 +5,9 @@ Provides local screenshot capture for testing purposes.
 
 from __future__ import annotations
 
+import io
+from typing import Tuple
+
 from PIL import Image
 
 try:
@@ -42,3 +45,49 @@ def capture_screenshot() -> Image.Image:
 def save_screenshot(image: Image.Image, path: str) -> None:
     """Save a screenshot to the specified path."""
     image.save(path)
+
+
+def prepare_vision_image(
+    image: Image.Image, max_edge: int = 1024, quality: int = 75
+) -> Tuple[bytes, float]:
+    """
+    Downscale a screenshot and encode it as JPEG for a vision LLM call.
+
+    Vision token count (and latency/cost) grows with pixel count, and the
+    model does not need full-resolution pixels to pick the next action.
+
+    Args:
+        image: Full-resolution screenshot.
+        max_edge: Longest edge (px) of the image sent to the model.
+        quality: JPEG quality.
+
+    Returns:
+        (jpeg_bytes, scale) where scale = sent size / original size.
+        Use scale_action_to_screen() to map returned coordinates back.
+    """
+    scale = min(1.0, max_edge / max(image.size))
+    if scale < 1.0:
+        # resize() returns a new image, so no defensive full-frame copy is needed;
+        # reducing_gap matches what thumbnail() does by default
+        image = image.resize(
+            (int(image.width * scale), int(image.height * scale)),
+            Image.BILINEAR,
+            reducing_gap=2.0,
+        )
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    # optimize=True (extra Huffman pass) costs far more encode time than the few % it saves
+    image.save(buffer, format="JPEG", quality=quality, optimize=False)
+    return buffer.getvalue(), scale
+
+
+def scale_action_to_screen(action, scale: float):
+    """Map a CLICK chosen on a downscaled image back to screen coordinates."""
+    if scale >= 1.0 or getattr(action, "type", None) != "CLICK":
+        return action
+    return action.model_copy(update={
+        "x": int(round(action.x / scale)),
+        "y": int(round(action.y / scale)),
+    })
@@ -1,7 +1,10 @@
 """Utilities module for the Computer Use Agent."""
 
 from .logger import get_logger
+from .serialization import dumps_json, write_json_atomic
 
 __all__ = [
     "get_logger",
+    "dumps_json",
+    "write_json_atomic",
 ]
@@ -33,3 +33,65 @@ FIND_ELEMENTS_JS = (
     for (const el of _baseEls) { _addEl(el); }
 """
 )
+
+
+def _snapshot_js(force: bool) -> str:
+    return (
+        "const allEls = (() => {\n"
+        "    const _snap = window.__dpEls;\n"
+        + ("" if force else "    if (_snap && !_snap.dirty) return _snap.els;\n")
+        + "    const _els = (() => {" + FIND_ELEMENTS_JS + "    return allEls;\n    })();\n"
+        """
+        const _next = {els: _els, dirty: false};
+        if (window.__dpObs) window.__dpObs.disconnect();
+        window.__dpObs = new MutationObserver(() => { _next.dirty = true; window.__dpObs.disconnect(); });
+        window.__dpObs.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+        window.__dpEls = _next;
+        return _els;
+    })();
+"""
+    )
+
+
+# Same allEls[], but the list is also kept on window as a snapshot until the DOM
+# mutates. Observation always rescans (visibility depends on the scroll position)
+# and refreshes the snapshot; actions reuse it, so BROWSER_CLICK/TYPE skip a DOM
+# walk and index the exact list the LLM was shown. A navigation drops it.
+SNAPSHOT_ELEMENTS_JS = _snapshot_js(force=True)
+CACHED_ELEMENTS_JS = _snapshot_js(force=False)
+
+# Page-side helpers BrowserController installs once (init script + current
+# document) so clicks/types are a short call instead of shipping and compiling
+# the whole element scan per action.
+BROWSER_HELPERS_JS = (
+    """(() => {
+    window.__dpGetEls = () => {""" + CACHED_ELEMENTS_JS + """        return allEls;
+    };
+    window.__dpClick = (idx) => {
+        const els = window.__dpGetEls();
+        if (idx >= els.length) return false;
+        els[idx].click();
+        return true;
+    };
+    window.__dpFocusClick = (idx) => {
+        const els = window.__dpGetEls();
+        if (idx >= els.length) return false;
+        window.__dpTarget = els[idx];
+        els[idx].focus();
+        els[idx].click();
+        return true;
+    };
+    // Content of the last __dpFocusClick target (or the field focused inside it);
+    // false when it can't be read, e.g. focus went into an iframe
+    window.__dpTargetValue = () => {
+        let el = window.__dpTarget;
+        if (!el || !el.isConnected) return false;
+        const active = document.activeElement;
+        if (active && active !== el && el.contains(active)) el = active;
+        if (el.tagName === 'IFRAME' || el.tagName === 'FRAME') return false;
+        if (el.isContentEditable) return el.innerText;
+        return 'value' in el ? String(el.value) : el.textContent;
+    };
+})();
+"""
+)
@@ -0,0 +1,43 @@
+"""
+JSON serialization helpers for run artifacts (metadata, action logs).
+Uses orjson (C/Rust-backed, returns bytes) when installed, stdlib json otherwise.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_json(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Serialize obj to UTF-8 JSON bytes.
+
+    Args:
+        obj: JSON-compatible data (dicts, lists, str, numbers, bool, None).
+        pretty: Indent with 2 spaces (for human-readable files like metadata.json).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_json_atomic(path: Union[str, Path], obj: Any, pretty: bool = True) -> None:
+    """
+    Write obj as JSON to path atomically: the bytes go to a sibling
+    "<name>.tmp" file which then replaces path, so readers (and crash
+    recovery) never see a half-written file.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(dumps_json(obj, pretty=pretty))  # One write() call: already serialized
+    os.replace(tmp, path)
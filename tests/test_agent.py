@@ -0,0 +1,106 @@
+"""Agent.run with a fake planner and desktop: no plan replay, traces from executed plans, per-run state."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from cua_backend.agent import core
+from cua_backend.agent.planner import PlannerOutput
+from cua_backend.execution.executor import ExecutionResult
+from cua_backend.schemas.tasks import Task
+
+
+class FakeDesktop:
+    """Static editor window: the title never changes, whatever is typed."""
+
+    def __init__(self):
+        self.executed = []
+
+    def observe(self, save_to=None):
+        return Image.new("RGB", (64, 48)), self.get_window_meta()
+
+    def get_window_meta(self):
+        return {"window_title": "Untitled 1 - Mousepad", "active_app": "Mousepad",
+                "current_url": "", "is_browser": False}
+
+    def execute(self, action):
+        self.executed.append(action)
+        return ExecutionResult(ok=True)
+
+    def execute_batch(self, actions):
+        return [self.execute(a) for a in actions]
+
+    def get_window_list(self):
+        return []
+
+    def get_browser_state(self):
+        return None
+
+
+class FakePlanner:
+    def __init__(self):
+        self.inputs = []
+        self.recorded = None
+        self._lock = threading.Lock()
+
+    def decide(self, inp):
+        with self._lock:
+            self.inputs.append(inp)
+        return PlannerOutput(action_type="TYPE", action_param=f"TYPE(line {inp.step})",
+                             expected_window_title="Mousepad")
+
+    def record_success(self, goal, sequences):
+        self.recorded = (goal, sequences)
+
+
+def test_same_screen_is_replanned_not_replayed(tmp_path):
+    desktop, planner = FakeDesktop(), FakePlanner()
+    with core.Agent(planner, desktop, runs_dir=str(tmp_path)) as agent:
+        result = agent.run(Task(goal="write three lines", max_steps=3))
+    assert not result.success
+    # One decision per step although title and URL never changed
+    assert [inp.step for inp in planner.inputs] == [1, 2, 3]
+    assert [a.text for a in desktop.executed] == ["line 1", "line 2", "line 3"]
+
+
+def test_success_records_only_executed_plans(tmp_path):
+    desktop = FakeDesktop()
+
+    class DonePlanner(FakePlanner):
+        def decide(self, inp):
+            self.inputs.append(inp)
+            if inp.step == 1:
+                return PlannerOutput(action_type="TYPE", action_param="TYPE(hello)",
+                                     expected_window_title="Mousepad")
+            return PlannerOutput(action_type="DONE", action_param="DONE(typed)")
+
+    planner = DonePlanner()
+    with core.Agent(planner, desktop, runs_dir=str(tmp_path)) as agent:
+        result = agent.run(Task(goal="type hello", max_steps=4))
+    assert result.success
+    assert planner.recorded == ("type hello", ["TYPE(hello)", "DONE(typed)"])
+
+
+def test_each_run_starts_with_fresh_history(tmp_path):
+    desktop, planner = FakeDesktop(), FakePlanner()
+    with core.Agent(planner, desktop, runs_dir=str(tmp_path)) as agent:
+        agent.run(Task(goal="write a line", max_steps=2))
+        first_run = len(planner.inputs)
+        agent.run(Task(goal="write a line", max_steps=2))
+    assert planner.inputs[first_run].step == 1
+    assert planner.inputs[first_run].history == planner.inputs[0].history
+
+
+def test_settle_waits_for_running_future():
+    done = threading.Event()
+
+    def slow():
+        time.sleep(0.05)
+        done.set()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fut = pool.submit(slow)
+        time.sleep(0.01)  # Let it start: cancel() can no longer stop it
+        core.Agent._settle(fut)
+        assert done.is_set()
@@ -0,0 +1,67 @@
+"""DesktopController.execute_batch: merged runs and one result per action."""
+import pytest
+
+from cua_backend.execution import desktop_controller as dc
+from cua_backend.schemas.actions import (
+    ClickAction,
+    DoneAction,
+    FailAction,
+    PressKeyAction,
+    TypeAction,
+    WaitAction,
+)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record the low-level calls instead of driving a desktop."""
+    log = []
+    monkeypatch.setattr(dc, "type_text", lambda text: log.append(("type", text)))
+    monkeypatch.setattr(dc, "press_keys", lambda keys: log.append(("keys", keys)))
+    monkeypatch.setattr(dc, "press_key", lambda key: log.append(("key", key)))
+    monkeypatch.setattr(dc, "wait", lambda seconds: log.append(("wait", seconds)))
+    monkeypatch.setattr(dc, "click", lambda x, y: log.append(("click", x, y)))
+    return log
+
+
+def test_execute_batch_merges_runs(calls):
+    actions = [
+        PressKeyAction(key="Alt+F2"),
+        TypeAction(text="mouse"),
+        TypeAction(text="pad"),
+        PressKeyAction(key="Enter"),
+        PressKeyAction(key="Tab"),
+        WaitAction(seconds=1),
+        WaitAction(seconds=0.5),
+        ClickAction(x=10, y=20),
+        DoneAction(final_answer="ok"),
+    ]
+    results = dc.DesktopController().execute_batch(actions)
+    assert calls == [
+        ("key", "Alt+F2"),  # Combos are never merged
+        ("type", "mousepad"),
+        ("keys", ["Enter", "Tab"]),
+        ("wait", 1.5),
+        ("click", 10, 20),
+    ]
+    assert len(results) == len(actions)
+    assert all(r.ok for r in results)
+
+
+def test_execute_batch_single_actions_use_execute(calls):
+    results = dc.DesktopController().execute_batch([TypeAction(text="a"), PressKeyAction(key="Enter")])
+    assert calls == [("type", "a"), ("key", "Enter")]
+    assert len(results) == 2
+
+
+def test_execute_batch_failed_run_shares_its_result(calls, monkeypatch):
+    def broken(text):
+        raise RuntimeError("xdotool type failed (1)")
+
+    monkeypatch.setattr(dc, "type_text", broken)
+    results = dc.DesktopController().execute_batch(
+        [TypeAction(text="a"), TypeAction(text="b"), FailAction(error="gave up")]
+    )
+    assert [r.ok for r in results] == [False, False, False]
+    assert results[0].error == "xdotool type failed (1)"
+    assert results[2].error == "gave up"
@@ -0,0 +1,171 @@
+"""Planner: sequence parsing, standard-skill fast path, decision caches, seed plans."""
+from cua_backend.agent.planner import (
+    Planner,
+    PlannerInput,
+    PlannerOutput,
+    TextState,
+    _fast_path,
+    _parse_sequence,
+    parse_actions,
+)
+from cua_backend.schemas.actions import (
+    BrowserNavigateAction,
+    DoneAction,
+    FailAction,
+    PressKeyAction,
+    TypeAction,
+    WaitAction,
+)
+
+
+def _planner(outputs):
+    """Configured Planner whose LM module returns `outputs` in order and logs its inputs."""
+    planner = Planner()
+    planner._configured = True
+    calls = []
+
+    def module(inp):
+        calls.append(inp)
+        return outputs[len(calls) - 1]
+
+    planner._module = module
+    return planner, calls
+
+
+# ─── parse_actions ───────────────────────────────────────────
+
+def test_parse_actions_sequence():
+    out = PlannerOutput(action_type="PRESS_KEY",
+                        action_param="PRESS_KEY(Alt+F2); WAIT(1.5); TYPE('mousepad'); DONE")
+    actions = parse_actions(out)
+    assert [type(a) for a in actions] == [PressKeyAction, WaitAction, TypeAction, DoneAction]
+    assert actions[0].key == "Alt+F2"
+    assert actions[1].seconds == 1.5
+    assert actions[2].text == "mousepad"
+
+
+def test_parse_actions_bare_terminal():
+    (action,) = parse_actions(PlannerOutput(action_type="DONE", action_param=" done "))
+    assert isinstance(action, DoneAction)
+
+
+def test_parse_actions_unparseable_is_fail():
+    (action,) = parse_actions(PlannerOutput(action_type="TYPE", action_param="nonsense"))
+    assert isinstance(action, FailAction)
+
+
+def test_parse_actions_memoized():
+    _parse_sequence.cache_clear()
+    out = PlannerOutput(action_type="TYPE", action_param="TYPE(hello); PRESS_KEY(ENTER)", reason="r")
+    first = parse_actions(out)
+    second = parse_actions(out)
+    info = _parse_sequence.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    assert first == second
+    assert first is not second  # Each caller gets its own list
+
+    parse_actions(PlannerOutput(action_type="TYPE", action_param="TYPE(hello); PRESS_KEY(ENTER)", reason="other"))
+    assert _parse_sequence.cache_info().misses == 2  # The reason is part of the key
+
+
+# ─── _fast_path ──────────────────────────────────────────────
+
+def test_fast_path_open_app():
+    out = _fast_path(PlannerInput(goal="Open mousepad", step=1,
+                                  text_state=TextState(window_title="Desktop")))
+    assert out is not None
+    actions = parse_actions(out)
+    assert TypeAction(text="mousepad", reason=out.reason) in actions
+    assert actions[-1] == PressKeyAction(key="ENTER", reason=out.reason)
+    assert out.expected_window_title
+
+
+def test_fast_path_open_app_already_open():
+    inp = PlannerInput(goal="open mousepad", step=1,
+                       text_state=TextState(active_app="Mousepad", window_title="Untitled 1 - Mousepad"))
+    assert _fast_path(inp) is None
+
+
+def test_fast_path_go_to_url():
+    out = _fast_path(PlannerInput(goal="go to example.com", step=1,
+                                  text_state=TextState(is_browser=True)))
+    assert out is not None
+    assert parse_actions(out) == [BrowserNavigateAction(url="example.com", reason=out.reason)]
+
+
+def test_fast_path_go_to_url_needs_browser():
+    assert _fast_path(PlannerInput(goal="go to example.com", step=1)) is None
+
+
+def test_fast_path_only_on_empty_history():
+    inp = PlannerInput(goal="open mousepad", step=2, history=["Step 1: [...] -> FAIL"])
+    assert _fast_path(inp) is None
+
+
+# ─── decision caches ─────────────────────────────────────────
+
+def test_cache_keys():
+    ts = TextState(active_app="Mousepad", window_title="Untitled 1 - Mousepad")
+    a = PlannerInput(goal="g", step=3, history=["Step 2: [TypeAction] -> OK"], text_state=ts)
+    b = PlannerInput(goal="g", step=6, history=["Step 5: [TypeAction] -> OK"], text_state=ts)
+    c = PlannerInput(goal="g", step=1, text_state=ts)
+    exact_a, situation_a = Planner._cache_keys(a)
+    exact_b, situation_b = Planner._cache_keys(b)
+    exact_c, situation_c = Planner._cache_keys(c)
+    assert exact_a != exact_b  # Full history is part of the exact key
+    assert situation_a == situation_b  # Same screen reached the same way
+    assert situation_a != situation_c
+    assert Planner._cache_keys(a) == (exact_a, situation_a)
+
+
+def test_situation_key_tracks_browser_elements():
+    page = dict(is_browser=True, current_url="https://example.com", window_title="Example")
+    history = ["Step 1: [ScrollAction] -> OK"]
+    top = PlannerInput(goal="g", step=2, history=history,
+                       text_state=TextState(**page, interactive_elements="[1] <A> 'More'"))
+    scrolled = PlannerInput(goal="g", step=2, history=history,
+                            text_state=TextState(**page, interactive_elements="[1] <A> 'Next'"))
+    assert Planner._cache_keys(top)[1] != Planner._cache_keys(scrolled)[1]
+
+
+def test_decide_cache_hit_and_history_miss():
+    out = PlannerOutput(action_type="TYPE", action_param="TYPE(hello)")
+    planner, calls = _planner([out, out])
+    ts = TextState(active_app="Mousepad", window_title="Untitled 1 - Mousepad")
+
+    first = PlannerInput(goal="type hello", step=1, text_state=ts)
+    assert planner.decide(first) is out
+    assert planner.decide(PlannerInput(goal="type hello", step=1, text_state=ts)) is out
+    assert len(calls) == 1
+    assert planner.stats["exact_hits"] == 1
+
+    # Same screen after a successful step: a new decision, never a replay
+    after = PlannerInput(goal="type hello", step=2, text_state=ts,
+                         history=["Step 1: [TypeAction(text='hello')] -> STEP SUCCESS"])
+    planner.decide(after)
+    assert len(calls) == 2
+
+
+def test_decide_skips_caching_vision_outputs():
+    out = PlannerOutput(action_type="WAIT", action_param="WAIT(1)", needs_vision=True)
+    planner, calls = _planner([out, out])
+    inp = PlannerInput(goal="g", step=1)
+    planner.decide(inp)
+    planner.decide(inp)
+    assert len(calls) == 2
+
+
+# ─── seed plans ──────────────────────────────────────────────
+
+def test_record_success_seeds_similar_goal():
+    out = PlannerOutput(action_type="TYPE", action_param="TYPE(x)")
+    planner, calls = _planner([out])
+    planner.record_success("open mousepad and type hello", ["PRESS_KEY(Alt+F2)", "TYPE(hello)"])
+    planner.record_success("ignored goal", [])  # Nothing executed: nothing to keep
+
+    assert planner._seed_for("open mousepad and type hi") == "1. PRESS_KEY(Alt+F2)\n2. TYPE(hello)"
+    assert planner._seed_for("open firefox") == ""
+
+    planner.decide(PlannerInput(goal="open mousepad and type hi", step=1,
+                                history=["Step 0: note"]))
+    assert calls[0].seed_plan.startswith("1. PRESS_KEY(Alt+F2)")
@@ -0,0 +1,77 @@
+"""AgentState step records and the planner-facing HistoryRing."""
+from cua_backend.agent.state import AgentState, HistoryRing
+
+
+# ─── HistoryRing ─────────────────────────────────────────────
+
+def test_history_ring_renders_steps_and_notes():
+    ring = HistoryRing()
+    ring.set_checklist("open app, type text")
+    ring.append_step(1, "[PressKeyAction]", True, "STEP SUCCESS")
+    ring.append_note(1, "URGENT: try something else")
+    assert ring.render_for_prompt() == [
+        "Checklist: open app, type text",
+        "Step 1: [PressKeyAction] -> STEP SUCCESS",
+        "URGENT: try something else",
+    ]
+
+
+def test_history_ring_collapses_failure_streaks():
+    ring = HistoryRing()
+    ring.append_step(1, "a", False, "FAIL 1")
+    ring.append_step(2, "b", False, "FAIL 2")
+    ring.append_step(3, "c", False, "FAIL 3")
+    ring.append_step(4, "d", True, "OK")
+    ring.collapse_failures()
+    assert len(ring) == 2
+    assert ring.render_for_prompt() == [
+        "Steps 1-3: 3 consecutive failures, last: c -> FAIL 3",
+        "Step 4: d -> OK",
+    ]
+
+
+def test_history_ring_archives_old_steps():
+    ring = HistoryRing()
+    for step in range(1, 8):
+        ring.append_step(step, f"s{step}", step != 2, "note")
+    ring.archive_older_than(5)
+    lines = ring.render_for_prompt()
+    assert len(ring) == 5
+    assert lines[0] == "(archived earlier steps: 1 ok, 1 failed, last failure at step 2)"
+    assert lines[1].startswith("Step 3:")
+
+
+def test_history_ring_is_bounded():
+    ring = HistoryRing(maxlen=3)
+    for step in range(1, 10):
+        ring.append_step(step, "a", True, "ok")
+    assert len(ring) == 3
+
+
+# ─── AgentState ──────────────────────────────────────────────
+
+def _state(n: int) -> AgentState:
+    state = AgentState(goal="g", max_steps=20)
+    for step in range(1, n + 1):
+        state.add_step(step, "WAIT", {"type": "WAIT", "seconds": 1.0}, step % 3 != 0, f"step_{step:03d}.png")
+    return state
+
+
+def test_history_records_are_built_once():
+    state = _state(2)
+    history = state.history
+    assert [r.step for r in history] == [1, 2]
+    state.add_step(3, "DONE", {"type": "DONE"}, True)
+    assert state.history[0] is history[0]
+    assert [r.step for r in state.history] == [1, 2, 3]
+    assert state.step_dicts(2)[0]["action_type"] == "DONE"
+
+
+def test_get_history_for_llm_bounds_and_evicts():
+    state = _state(6)
+    records = state.get_history_for_llm(max_steps=3, screenshot_keep=1)
+    assert records[0] == {"summary": "3 earlier steps archived: 2 ok, 1 failed, last failure at step 3"}
+    assert [r["step"] for r in records[1:]] == [4, 5, 6]
+    assert [r["screenshot_path"] for r in records[1:]] == ["[evicted]", "[evicted]", "step_006.png"]
+    # The full history (metadata) keeps every path
+    assert state.to_dict()["history"][3]["screenshot_path"] == "step_004.png"